@@ -0,0 +1,184 @@
+'''
+Two-tier answer cache for the answer server.
+The exact tier matches queries after normalization; the semantic tier matches queries whose
+hashed bag-of-words embedding is within a cosine threshold of a cached one.
+'''
+
+import itertools
+import math
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Tuple
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words that carry no meaning for matching: filler, plus the domain name every query shares
+STOP_WORDS = frozenset("""
+a about an and are can could do does for i in is it me of on please tell the to with you
+algorand blockchain
+""".split())
+
+# Words that set what kind of answer is wanted; "What is ARC-3?" and "How do I use ARC-3?" differ only here
+INTENT_WORDS = frozenset("""
+compare create difference explain how implement use what whats when where which who why
+""".split())
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and keep only word tokens, so "What is ARC-69?" and "what is arc 69" match."""
+    return " ".join(_TOKEN_PATTERN.findall(query.lower()))
+
+def embed_query(normalized: str, dimension: int = 1024) -> Dict[int, float]:
+    """
+    Signed feature hashing of content- and intent-word unigrams and bigrams, as a sparse unit vector.
+    Args:
+        normalized: Output of normalize_query
+        dimension: Number of hash buckets
+    Returns:
+        Dict of bucket -> weight with L2 norm 1 (empty for an empty query)
+    """
+    # Same scheme as Python_assistant's HashingEmbedder, kept as a sparse pure-Python copy because this
+    # folder is deployed on its own and the cache must not pull in numpy for a handful of features
+    tokens = [token for token in normalized.split() if token not in STOP_WORDS]
+    vector: Dict[int, float] = {}
+    for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        h = zlib.crc32(feature.encode("utf-8"))
+        bucket = h % dimension
+        vector[bucket] = vector.get(bucket, 0.0) + (-1.0 if h & 0x80000000 else 1.0)
+    norm = math.sqrt(sum(w * w for w in vector.values()))
+    return {bucket: w / norm for bucket, w in vector.items() if w} if norm else {}
+
+def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(bucket, 0.0) for bucket, w in a.items())
+
+def _numbers(normalized: str) -> Tuple[str, ...]:
+    # "ARC 69" and "ARC 19" embed close together but are different standards
+    return tuple(token for token in normalized.split() if token.isdigit())
+
+def _intent(normalized: str) -> FrozenSet[str]:
+    return frozenset(token for token in normalized.split() if token in INTENT_WORDS)
+
+def has_content(normalized: str) -> bool:
+    """Whether a normalized query has a word beyond filler and question words, i.e. names a topic."""
+    return any(token not in STOP_WORDS and token not in INTENT_WORDS for token in normalized.split())
+
+class AnswerCache:
+    """
+    Thread-safe LRU cache of LLM answers with a TTL and a size bound.
+    The semantic tier compares against at most `semantic_scan` of the most recently used entries,
+    and does so outside the lock.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0,
+                 similarity_threshold: float = 0.9, dimension: int = 1024, semantic_scan: int = 256):
+        self.max_entries = max_entries
+        self.semantic_scan = semantic_scan
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.dimension = dimension
+        # normalized query -> (answer, embedding, expiry time), least recently used first
+        self._entries: "OrderedDict[str, Tuple[str, Dict[int, float], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, query: str) -> Optional[Tuple[str, str]]:
+        """
+        Look up a cached answer.
+        Args:
+            query: Raw user query
+        Returns:
+            (answer, tier) with tier "exact" or "semantic", or None on a miss
+        """
+        normalized = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(normalized)
+            if entry is not None and entry[2] > now:
+                self._entries.move_to_end(normalized)
+                self._counters["exact_hits"] += 1
+                return entry[0], "exact"
+            if not has_content(normalized):
+                self._counters["misses"] += 1
+                return None
+            # Copy the most recent entries; scoring them happens without holding the lock
+            recent = list(itertools.islice(reversed(self._entries.items()), self.semantic_scan))
+
+        vector = embed_query(normalized, self.dimension)
+        numbers, intent = _numbers(normalized), _intent(normalized)
+        best_key, best_entry, best_score = None, None, self.similarity_threshold
+        expired = []
+        for key, cached in recent:
+            if cached[2] <= now:
+                expired.append((key, cached))
+                continue
+            score = _cosine(vector, cached[1])
+            if score >= best_score and _numbers(key) == numbers and _intent(key) == intent:
+                best_key, best_entry, best_score = key, cached, score
+
+        with self._lock:
+            for key, cached in expired:
+                # Skip entries that were refreshed by a put in the meantime
+                if self._entries.get(key) is cached:
+                    del self._entries[key]
+                    self._counters["expirations"] += 1
+            if best_key is None or self._entries.get(best_key) is not best_entry:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._counters["semantic_hits"] += 1
+            return best_entry[0], "semantic"
+
+    def put(self, query: str, answer: str):
+        """
+        Cache the answer to a query, evicting the least recently used entries beyond max_entries.
+        Queries with no content words ("what is it?") are not cached, since any answer depends on context.
+        """
+        normalized = normalize_query(query)
+        if not has_content(normalized):
+            return
+        entry = (answer, embed_query(normalized, self.dimension), time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._entries[normalized] = entry
+            self._entries.move_to_end(normalized)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Counters, current size and hit rate."""
+        with self._lock:
+            stats = dict(self._counters, size=len(self._entries), max_entries=self.max_entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
+
+def check_matching():
+    """Regression check: paraphrases hit the semantic tier, different intents or numbers miss it."""
+    cache = AnswerCache()
+    cache.put("What is ARC-3?", "ARC-3 answer")
+    for query, expected in [
+        ("what is arc 3", "exact"),
+        ("What is the ARC-3 on Algorand?", "semantic"),
+        ("How do I use ARC-3?", None),
+        ("Why use ARC-3?", None),
+        ("Explain ARC-3", None),
+        ("What is ARC-19?", None),
+    ]:
+        hit = cache.get(query)
+        tier = hit[1] if hit else None
+        assert tier == expected, f"{query!r}: expected {expected}, got {tier}"
+    cache.put("What is it?", "depends on context")
+    assert cache.get("What is it?") is None, "queries without content words must not be cached"
+    print("answer cache matching OK")
+
+if __name__ == "__main__":
+    check_matching()
@@ -0,0 +1,15 @@
+'''
+Production serving config: gunicorn -c gunicorn.conf.py mcp_server:app
+Threaded workers keep many requests open at once while their LLM calls
+overlap on each worker's shared event loop (see llm_worker.py).
+'''
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+threads = int(os.getenv("GUNICORN_THREADS", "128"))
+# LLM answers can take a while; streamed responses keep the connection busy for their whole length
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+keepalive = 5
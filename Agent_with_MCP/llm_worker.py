@@ -0,0 +1,173 @@
+'''
+Shared asyncio event loop for LLM calls from a threaded WSGI server.
+Request threads hand their chain.ainvoke coroutine to one loop running in a daemon thread,
+so concurrent requests overlap on LLM I/O and share its HTTP connection pool.
+Identical requests already in flight are coalesced into one upstream call, and MicroBatcher
+can group calls arriving close together into one chain.abatch.
+'''
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class LLMWorker:
+    """
+    Event loop in a background thread, started on first use so it is created
+    after a pre-forking server (gunicorn) has forked its workers.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # key -> task of the upstream call in flight; only touched on the loop thread
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._counters = {"upstream_calls": 0, "coalesced": 0}
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(target=loop.run_forever, name="llm-worker", daemon=True)
+                    self._thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """Schedule a coroutine on the worker loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable) -> Any:
+        """
+        Run a coroutine on the worker loop and block the calling thread until it finishes.
+        Raises:
+            concurrent.futures.TimeoutError: If it takes longer than the worker timeout; it is then cancelled
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def _single_flight(self, key: Optional[Hashable], make_coro: Callable[[], Awaitable]) -> Any:
+        # Runs on the loop thread, so the counters and _inflight need no lock
+        if key is None:
+            self._counters["upstream_calls"] += 1
+            return await make_coro()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_coro())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self._counters["upstream_calls"] += 1
+        else:
+            self._counters["coalesced"] += 1
+        # shield: a waiter that times out must not cancel the call the others share
+        return await asyncio.shield(task)
+
+    def ainvoke(self, chain, input: Any, key: Optional[Hashable] = None) -> Any:
+        """
+        Blocking chain.ainvoke on the worker loop.
+        Args:
+            chain: Runnable to call
+            input: Chain input
+            key: If given, concurrent calls with the same key share one upstream call and its result
+        Returns:
+            Chain output
+        """
+        return self.run(self._single_flight(key, lambda: chain.ainvoke(input)))
+
+    def stats(self) -> Dict:
+        """Upstream call and coalescing counters."""
+        stats = dict(self._counters, in_flight=len(self._inflight))
+        total = stats["upstream_calls"] + stats["coalesced"]
+        stats["coalesced_rate"] = stats["coalesced"] / total if total else 0.0
+        return stats
+
+    def close(self):
+        """Stop the loop; a later call starts a fresh one."""
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._loop.close()
+                self._loop = self._thread = None
+
+class MicroBatcher:
+    """
+    Gathers calls arriving within a short window and sends them upstream as one chain.abatch.
+    Exposes ainvoke like the chain it wraps, so it can be passed to LLMWorker.ainvoke in its place.
+    Must be awaited on a single event loop, e.g. the LLMWorker's.
+    """
+
+    def __init__(self, chain, max_batch: int = 8, window_ms: float = 15.0, max_in_flight: int = 0):
+        self.chain = chain
+        self.max_batch = max_batch
+        self.window_ms = window_ms
+        # Batches sent upstream at once (0: unlimited). While the limit is reached, requests wait here
+        # and go out as full batches of up to max_batch when a slot frees, instead of queueing upstream.
+        self.max_in_flight = max_in_flight
+        # (input, future) pairs waiting for the next flush
+        self._pending = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = 0
+        self._counters = {"requests": 0, "batches": 0, "full_batches": 0}
+
+    async def ainvoke(self, input: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((input, future))
+        self._counters["requests"] += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.max_in_flight and self._in_flight >= self.max_in_flight:
+            # Sent when a batch in flight completes
+            return
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if batch:
+            self._counters["batches"] += 1
+            self._counters["full_batches"] += len(batch) == self.max_batch
+            self._in_flight += 1
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        results = []
+        try:
+            results = await self.chain.abatch([input for input, _ in batch], return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            self._in_flight -= 1
+            if self._pending:
+                # These waited at least as long as the window already
+                self._flush()
+            # Runs on cancellation too (CancelledError is not an Exception), so no waiter is left hanging
+            for i, (_, future) in enumerate(batch):
+                if future.done():
+                    continue
+                result = results[i] if i < len(results) else RuntimeError("LLM batch was cancelled")
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Requests, batches sent and the mean batch size."""
+        stats = dict(self._counters, max_batch=self.max_batch, window_ms=self.window_ms,
+                     in_flight=self._in_flight, pending=len(self._pending))
+        stats["mean_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
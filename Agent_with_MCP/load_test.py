@@ -0,0 +1,141 @@
+'''
+Load test for the answer server against a fake LLM, reporting requests/sec and latency percentiles.
+By default the app is served in-process with the Groq model replaced by FakeLLM, a Runnable subclass
+whose abatch awaits asyncio.sleep, so no API key or network is needed; pass --url to hit a running server.
+A semaphore in abatch lets the fake serve a limited number of calls at once, each taking a fixed latency
+plus a small cost per item, like a model server; --max-batch sweeps the micro-batching sizes against it.
+'''
+
+import argparse
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import requests
+
+
+class FakeLLM:
+    """Builds a Runnable that answers after an async sleep, with at most `slots` calls in progress."""
+
+    def __init__(self, latency: float, per_item: float = 0.0, slots: int = 0):
+        self.latency = latency
+        self.per_item = per_item
+        self.slots = slots
+
+    def runnable(self):
+        from langchain_core.runnables import Runnable
+
+        fake = self
+        semaphore = None
+
+        class _FakeLLM(Runnable):
+            def invoke(self, input, config=None, **kwargs):
+                time.sleep(fake.latency + fake.per_item)
+                return "Fake answer to: " + input.to_messages()[-1].content
+
+            async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+                nonlocal semaphore
+                if semaphore is None:
+                    semaphore = asyncio.Semaphore(fake.slots or 10 ** 6)
+                async with semaphore:
+                    await asyncio.sleep(fake.latency + fake.per_item * len(inputs))
+                return ["Fake answer to: " + prompt_value.to_messages()[-1].content for prompt_value in inputs]
+
+            async def ainvoke(self, input, config=None, **kwargs):
+                return (await self.abatch([input]))[0]
+
+        return _FakeLLM()
+
+def start_fake_server(fake: FakeLLM) -> tuple:
+    """Serve mcp_server.app on a free port with the LLM replaced by the fake."""
+    os.environ.setdefault("GROQ_API_KEY", "load-test")
+    # Measure the LLM path; the corpus tier would answer some queries without it
+    os.environ.setdefault("LOCAL_RETRIEVAL", "0")
+    from werkzeug.serving import make_server
+    import mcp_server
+
+    mcp_server.llm = fake.runnable()
+    mcp_server.chain = mcp_server.build_chain()
+    mcp_server.llm_runner = mcp_server.make_runner(mcp_server.chain)
+    # Per-request access logs would dominate the output
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, mcp_server.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+def run_level(url: str, clients: int, requests_per_client: int, same_query: bool = False) -> List[float]:
+    """
+    Each client sends its requests back to back; returns every request latency in seconds.
+    With same_query every request asks the same question, exercising cache and coalescing.
+    """
+    local = threading.local()
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    def client(_):
+        local.session = getattr(local, "session", None) or requests.Session()
+        latencies = []
+        for _ in range(requests_per_client):
+            with lock:
+                i = next(counter)
+            # Distinct numbers keep the answer cache from serving any of them
+            query = "load test question" if same_query else f"load test question {clients} {i}"
+            start = time.perf_counter()
+            response = local.session.post(f"{url}/answer_query", json={"user_query": query})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        return [latency for latencies in pool.map(client, range(clients)) for latency in latencies]
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Requests/sec and p99 of /answer_query at several concurrency levels")
+    parser.add_argument("--url", default=None, help="Running server to test (default: in-process server with a fake LLM)")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 128])
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM seconds per call")
+    parser.add_argument("--per-item-ms", type=float, default=5.0, help="Fake LLM extra ms per batched input")
+    parser.add_argument("--llm-slots", type=int, default=0, help="Fake LLM calls served at once (0: unlimited)")
+    parser.add_argument("--max-batch", type=int, nargs="+", default=[1],
+                        help="Micro-batch sizes to compare (1: no batching)")
+    parser.add_argument("--window-ms", type=float, default=15.0, help="Micro-batching window")
+    parser.add_argument("--same-query", action="store_true",
+                        help="Every client asks the same question (one request each, cache cleared per level)")
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        server, url = start_fake_server(FakeLLM(args.latency, args.per_item_ms / 1000, args.llm_slots))
+        print(f"Fake LLM latency {args.latency * 1000:.0f} ms + {args.per_item_ms:.0f} ms/item, "
+              f"{args.llm_slots or 'unlimited'} slots, serving at {url}")
+    print(f"{'batch':>5s} {'clients':>7s} {'requests':>8s} {'req/sec':>8s} {'p50 ms':>8s} {'p99 ms':>8s}")
+    for max_batch in args.max_batch:
+        if args.url is None:
+            import mcp_server
+            os.environ["LLM_MAX_BATCH"] = str(max_batch)
+            os.environ["LLM_BATCH_WINDOW_MS"] = str(args.window_ms)
+            # Match the fake's capacity, so requests fill batches up to max_batch instead of queueing for a slot
+            os.environ["LLM_MAX_CONCURRENT_BATCHES"] = str(args.llm_slots)
+            mcp_server.llm_runner = mcp_server.make_runner(mcp_server.chain)
+        for clients in args.clients:
+            if args.url is None:
+                # Later levels repeat the queries of earlier ones
+                mcp_server.answer_cache.clear()
+            start = time.perf_counter()
+            latencies = run_level(url, clients, 1 if args.same_query else args.requests, args.same_query)
+            elapsed = time.perf_counter() - start
+            print(f"{max_batch:5d} {clients:7d} {len(latencies):8d} {len(latencies) / elapsed:8.1f} "
+                  f"{percentile(latencies, 0.5) * 1000:8.1f} {percentile(latencies, 0.99) * 1000:8.1f}")
+    print("LLM worker:", requests.get(f"{url}/llm/stats").json())
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
 from dotenv import load_dotenv
+import json
 import os
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+from answer_cache import AnswerCache, normalize_query
+from llm_worker import LLMWorker, MicroBatcher
+from retrieval import DEFAULT_QA_FILE, LocalRetriever, TierMetrics
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -24,42 +31,218 @@ llm = ChatGroq(
 )
 output_parser = StrOutputParser()
 
+# Cache of recent answers, so repeated questions skip the LLM
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.9")),
+)
+
+# Answers close matches from the local QA corpus before calling the LLM; LOCAL_RETRIEVAL=0 turns it off
+retriever = LocalRetriever(
+    qa_file=os.getenv("RETRIEVAL_QA_FILE", DEFAULT_QA_FILE),
+    threshold=float(os.getenv("RETRIEVAL_THRESHOLD", "0.8")),
+) if os.getenv("LOCAL_RETRIEVAL", "1") != "0" else None
+if retriever is not None:
+    # Build the index in the background so the first request does not pay for it
+    threading.Thread(target=lambda: retriever.available, name="retrieval-warmup", daemon=True).start()
+# Weaker matches are still passed to the LLM as context above this score
+RETRIEVAL_CONTEXT_THRESHOLD = float(os.getenv("RETRIEVAL_CONTEXT_THRESHOLD", "0.3"))
+
+# Latency and share of requests answered by each tier: cache, retrieval, llm
+tier_metrics = TierMetrics()
+
+def build_chain():
+    """Prompt -> Groq LLM -> string chain used by both answer routes."""
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "You are an expert Algorand Blockchain developer assistant with comprehensive knowledge of the Algorand Blockchain. Answer user queries to the best of your ability.{context}",
+            ),
+            ("human", "{query}"),
+        ]
+    )
+    return prompt | llm | output_parser
+
+# Built once and shared by all requests; runnables are safe to call concurrently
+chain = build_chain()
+
+# Runs chain.ainvoke for request threads on one shared event loop
+llm_worker = LLMWorker(timeout=float(os.getenv("LLM_TIMEOUT", "120")))
+
+def make_runner(chain):
+    """
+    What /answer_query awaits: the chain itself, or with LLM_MAX_BATCH > 1 a MicroBatcher that sends
+    requests arriving within LLM_BATCH_WINDOW_MS of each other upstream as one chain.abatch,
+    with at most LLM_MAX_CONCURRENT_BATCHES batches in flight (0: unlimited).
+    """
+    max_batch = int(os.getenv("LLM_MAX_BATCH", "1"))
+    if max_batch <= 1:
+        return chain
+    return MicroBatcher(chain, max_batch=max_batch, window_ms=float(os.getenv("LLM_BATCH_WINDOW_MS", "15")),
+                        max_in_flight=int(os.getenv("LLM_MAX_CONCURRENT_BATCHES", "0")))
+
+llm_runner = make_runner(chain)
+
+def retrieve(user_query: str) -> Tuple[Optional[str], str]:
+    """
+    Look the query up in the local QA corpus.
+    Args:
+        user_query: The user's question
+    Returns:
+        (answer, context): the corpus answer if the match clears the threshold, else None and
+        the prompt context for the LLM ("" when there is no useful match)
+    """
+    match = retriever.search(user_query) if retriever is not None else None
+    if match is None:
+        return None, ""
+    question, answer, score = match
+    if score >= retriever.threshold:
+        return answer, ""
+    if score >= RETRIEVAL_CONTEXT_THRESHOLD:
+        return None, f"\n\nA related entry from the Algorand QA dataset:\nQuestion: {question}\nAnswer: {answer}"
+    return None, ""
+
+def stream_answer(user_query: str, metrics: Optional[Dict] = None) -> Iterator[str]:
+    """
+    Yield the answer to a query token by token as the LLM generates it.
+    Cached and corpus answers are yielded whole.
+    Args:
+        user_query: The user's question
+        metrics: Optional dict filled with first_token_ms, total_ms, tier and cache (the hit tier, or None)
+    Returns:
+        Iterator of text chunks
+    """
+    metrics = {} if metrics is None else metrics
+    start = time.perf_counter()
+    cached = answer_cache.get(user_query)
+    metrics["cache"] = cached[1] if cached else None
+    answer, context = (cached[0], "") if cached else retrieve(user_query)
+    if answer is not None:
+        metrics["tier"] = "cache" if cached else "retrieval"
+        metrics["first_token_ms"] = metrics["total_ms"] = (time.perf_counter() - start) * 1000
+        tier_metrics.record(metrics["tier"], time.perf_counter() - start)
+        yield answer
+        return
+
+    metrics["tier"] = "llm"
+    chunks = []
+    for chunk in chain.stream({"query": user_query, "context": context}):
+        if "first_token_ms" not in metrics:
+            metrics["first_token_ms"] = (time.perf_counter() - start) * 1000
+        chunks.append(chunk)
+        yield chunk
+    metrics["total_ms"] = (time.perf_counter() - start) * 1000
+    tier_metrics.record("llm", time.perf_counter() - start)
+    answer_cache.put(user_query, "".join(chunks))
+
+def get_user_query():
+    """Validate the JSON body; returns (user_query, None) or (None, error response)."""
+    # Validate request content type
+    if not request.is_json:
+        return None, (jsonify({"error": "Content-Type must be application/json"}), 400)
+    # Extract user_query from JSON body
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None, (jsonify({"error": "Request body must be a JSON object"}), 400)
+    user_query = data.get("user_query")
+    if not isinstance(user_query, str) or not user_query.strip():
+        return None, (jsonify({"error": "Missing user_query in request body"}), 400)
+    return user_query, None
+
+def sse_event(data: Dict, event: Optional[str] = None) -> str:
+    """Format one server-sent event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
 @app.route("/answer_query", methods=["POST"])
 def answer_query():
     '''
     This tool answers user queries related to the Algorand Blockchain.
     '''
-    # Validate request content type
-    if not request.is_json:
-        return jsonify({"error": "Content-Type must be application/json"}), 400
-
     try:
-        # Extract user_query from JSON body
-        data = request.get_json()
-        user_query = data.get("user_query")
-        if not user_query:
-            return jsonify({"error": "Missing user_query in request body"}), 400
-
-        # Create prompt
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    "You are an expert Algorand Blockchain developer assistant with comprehensive knowledge of the Algorand Blockchain. Answer user queries to the best of your ability.",
-                ),
-                ("human", "{query}"),
-            ]
-        )
-
-        # Create and invoke chain
-        chain = prompt | llm | output_parser
-        response = chain.invoke(input={"query": user_query})
-
-        return jsonify({"response": response}), 200
+        user_query, error = get_user_query()
+        if error:
+            return error
+
+        start = time.perf_counter()
+        cached = answer_cache.get(user_query)
+        if cached:
+            tier_metrics.record("cache", time.perf_counter() - start)
+            return jsonify({"response": cached[0], "cache": cached[1], "tier": "cache"}), 200
+
+        # Close matches in the local QA corpus are answered without the LLM
+        answer, context = retrieve(user_query)
+        if answer is not None:
+            tier_metrics.record("retrieval", time.perf_counter() - start)
+            return jsonify({"response": answer, "tier": "retrieval"}), 200
+
+        # Await the shared chain on the worker loop, so concurrent requests overlap on LLM I/O;
+        # identical queries already in flight wait for that call instead of making their own
+        response = llm_worker.ainvoke(llm_runner, {"query": user_query, "context": context},
+                                      key=normalize_query(user_query))
+        tier_metrics.record("llm", time.perf_counter() - start)
+        answer_cache.put(user_query, response)
+
+        return jsonify({"response": response, "tier": "llm"}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/answer_query/stream", methods=["POST"])
+def answer_query_stream():
+    '''
+    Same as /answer_query, but streams the answer as server-sent events:
+    one "data: {"token": ...}" event per chunk, then a "done" event with the latency metrics.
+    '''
+    user_query, error = get_user_query()
+    if error:
+        return error
+
+    def events():
+        metrics = {}
+        try:
+            for token in stream_answer(user_query, metrics):
+                if token:
+                    yield sse_event({"token": token})
+        except Exception as e:
+            yield sse_event({"error": str(e)}, event="error")
+            return
+        app.logger.info("Streamed answer: first token %.0f ms, total %.0f ms",
+                        metrics.get("first_token_ms", 0.0), metrics.get("total_ms", 0.0))
+        yield sse_event(metrics, event="done")
+
+    # X-Accel-Buffering stops reverse proxies from holding back the stream
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    '''
+    Hit rate, per-tier hits, evictions and size of the answer cache.
+    '''
+    return jsonify(answer_cache.stats()), 200
+
+@app.route("/llm/stats", methods=["GET"])
+def llm_stats():
+    '''
+    Upstream LLM calls, coalesced duplicate requests, calls in flight and micro-batching counters.
+    '''
+    stats = llm_worker.stats()
+    if isinstance(llm_runner, MicroBatcher):
+        stats["batching"] = llm_runner.stats()
+    return jsonify(stats), 200
+
+@app.route("/stats/tiers", methods=["GET"])
+def tier_stats():
+    '''
+    Share of requests and latency of each answering tier, plus the local retrieval status.
+    '''
+    stats = tier_metrics.stats()
+    stats["retrieval"] = retriever.status() if retriever is not None else {"available": False, "error": "disabled"}
+    return jsonify(stats), 200
+
 @app.route("/")
 def homepage():
     return "Server is running !!!"
@@ -0,0 +1,115 @@
+'''
+Local retrieval tier: TF-IDF search over the Python assistant's QA corpus.
+Queries that closely match a known question are answered from the corpus without the LLM;
+for the rest the best match is handed to the LLM as context.
+The index code lives in the Python assistant (tf_idf.py), found next to this directory or at
+PYTHON_ASSISTANT_DIR; its dependencies (numpy, scipy, spaCy and en_core_web_md) are in this
+directory's requirements.txt. If any of them is missing the tier logs a warning, reports itself
+unavailable on /stats/tiers, and every query goes to the LLM.
+'''
+
+import logging
+import os
+import sys
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+PYTHON_ASSISTANT_DIR = os.path.abspath(os.getenv(
+    "PYTHON_ASSISTANT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Python_assistant"),
+))
+DEFAULT_QA_FILE = os.path.join(PYTHON_ASSISTANT_DIR, "qa_pairs.json")
+# Saved next to the corpus rather than in the server's working directory
+DEFAULT_INDEX_DIR = os.path.join(PYTHON_ASSISTANT_DIR, "tfidf_index")
+
+logger = logging.getLogger(__name__)
+
+
+class LocalRetriever:
+    """
+    TF-IDF index over qa_pairs.json, loaded on first use and saved under index_dir.
+    """
+
+    def __init__(self, qa_file: str = DEFAULT_QA_FILE, threshold: float = 0.8,
+                 index_dir: str = DEFAULT_INDEX_DIR):
+        self.qa_file = qa_file
+        self.index_dir = index_dir
+        # Cosine score a match needs to be returned as the answer
+        self.threshold = threshold
+        self._index = None
+        self._search = None
+        self._error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> bool:
+        if self._index is not None or self._error is not None:
+            return self._index is not None
+        with self._lock:
+            if self._index is None and self._error is None:
+                try:
+                    if PYTHON_ASSISTANT_DIR not in sys.path:
+                        sys.path.append(PYTHON_ASSISTANT_DIR)
+                    from tf_idf import load_qa_pairs, setup_tfidf_search, tfidf_search
+                    self._index = setup_tfidf_search(load_qa_pairs(self.qa_file), self.index_dir)
+                    self._search = tfidf_search
+                except Exception as e:
+                    # ImportError: missing dependency; OSError: missing corpus file or spaCy model
+                    self._error = f"{type(e).__name__}: {e}"
+                    logger.warning("Local retrieval disabled, every query goes to the LLM: %s", self._error,
+                                   exc_info=not isinstance(e, (ImportError, OSError)))
+        return self._index is not None
+
+    @property
+    def available(self) -> bool:
+        return self._load()
+
+    def search(self, query: str) -> Optional[Tuple[str, str, float]]:
+        """
+        Best-matching QA pair for a query.
+        Args:
+            query: Raw user query
+        Returns:
+            (question, answer, score), or None if the tier is unavailable
+        """
+        if not self._load():
+            return None
+        question, answer, score = self._search(query, self._index)
+        return question, answer, float(score)
+
+    def status(self) -> Dict:
+        return {"available": self._index is not None, "error": self._error,
+                "threshold": self.threshold, "qa_file": self.qa_file}
+
+class TierMetrics:
+    """
+    Per-tier request counts and latency percentiles over a window of recent requests.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._latencies: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tier: str, seconds: float):
+        with self._lock:
+            self._counts[tier] = self._counts.get(tier, 0) + 1
+            self._latencies.setdefault(tier, deque(maxlen=self.window)).append(seconds)
+
+    def stats(self) -> Dict:
+        """Count, share of all requests, and p50/p99/mean latency in ms per tier."""
+        with self._lock:
+            counts = dict(self._counts)
+            latencies = {tier: sorted(values) for tier, values in self._latencies.items()}
+        total = sum(counts.values())
+        stats = {"total": total, "tiers": {}}
+        for tier, values in latencies.items():
+            stats["tiers"][tier] = {
+                "count": counts[tier],
+                "rate": counts[tier] / total,
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": values[len(values) // 2] * 1000,
+                "p99_ms": values[min(len(values) - 1, int(0.99 * len(values)))] * 1000,
+            }
+        return stats
@@ -12,4 +12,10 @@ query = {
 
 res = requests.post(url="https://algorand-assistant-vscode.onrender.com/answer_query" , json=query)
 
-print(res.text)
\ No newline at end of file
+print(res.text)
+
+# Streaming variant: print tokens as server-sent events arrive
+with requests.post(url="https://algorand-assistant-vscode.onrender.com/answer_query/stream", json=query, stream=True) as res:
+    for line in res.iter_lines(decode_unicode=True):
+        if line.startswith("data: "):
+            print(line[len("data: "):])
@@ -0,0 +1,188 @@
+import os
+import numpy as np
+from typing import Optional
+from quantization import SCORE_CHUNK_ROWS
+
+ANN_KINDS = ("ivf", "hnsw")
+
+
+def _normalized_chunks(matrix: np.ndarray, chunk_rows: int = SCORE_CHUNK_ROWS):
+    """Yield (start, L2-normalized float32 chunk) pairs without copying the whole matrix."""
+    for start in range(0, matrix.shape[0], chunk_rows):
+        chunk = np.asarray(matrix[start:start + chunk_rows], dtype=np.float32)
+        norms = np.sqrt(np.einsum("ij,ij->i", chunk, chunk))
+        yield start, chunk / np.maximum(norms, 1e-10)[:, None]
+
+class IVFIndex:
+    """
+    Pure-NumPy inverted-file index for cosine similarity.
+    Rows are clustered with spherical k-means; a query only visits the rows of its nprobe
+    closest clusters. Candidates are re-scored exactly by SimilarityIndex.
+    """
+    kind = "ivf"
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, ids: np.ndarray, nprobe: int = 8):
+        self.centroids = centroids
+        # Rows of list i are ids[offsets[i]:offsets[i + 1]]
+        self.offsets = offsets
+        self.ids = ids
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, nlist: Optional[int] = None, nprobe: int = 8,
+              iterations: int = 10, sample_size: int = 256, seed: int = 0) -> "IVFIndex":
+        """
+        Train centroids on a sample of rows and assign every row to its closest centroid.
+        Args:
+            matrix: Embeddings of shape (N, D), possibly memory-mapped
+            nlist: Number of clusters, defaults to about 4 * sqrt(N)
+            nprobe: Clusters visited per query
+            iterations: k-means iterations
+            sample_size: Training rows per cluster
+            seed: Random seed for the sample and the initial centroids
+        Returns:
+            IVFIndex
+        """
+        n = matrix.shape[0]
+        nlist = max(1, min(n, nlist or int(4 * np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample_ids = np.sort(rng.choice(n, size=min(n, nlist * sample_size), replace=False))
+        sample = np.asarray(matrix[sample_ids], dtype=np.float32)
+        sample /= np.maximum(np.linalg.norm(sample, axis=1, keepdims=True), 1e-10)
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = (sample @ centroids.T).argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=nlist)
+            # Empty clusters keep their previous centroid
+            filled = counts > 0
+            centroids[filled] = sums[filled] / np.maximum(np.linalg.norm(sums[filled], axis=1, keepdims=True), 1e-10)
+
+        assignment = np.empty(n, dtype=np.int32)
+        for start, chunk in _normalized_chunks(matrix):
+            assignment[start:start + len(chunk)] = (chunk @ centroids.T).argmax(axis=1)
+        ids = np.argsort(assignment, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=offsets[1:])
+        return cls(centroids, offsets, ids, nprobe)
+
+    def candidates(self, query_vec: np.ndarray, n: int) -> np.ndarray:
+        """
+        Row ids in the nprobe clusters closest to a normalized query.
+        Args:
+            query_vec: L2-normalized query of shape (D,)
+            n: Number of results wanted; ignored, every row in the probed clusters is returned
+        Returns:
+            Array of candidate row ids
+        """
+        nprobe = min(self.nprobe, len(self.centroids))
+        lists = np.argpartition(self.centroids @ query_vec, -nprobe)[-nprobe:]
+        return np.concatenate([self.ids[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+
+    def save(self, path: str):
+        np.savez(path, centroids=self.centroids, offsets=self.offsets, ids=self.ids, nprobe=self.nprobe)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["offsets"], data["ids"], int(data["nprobe"]))
+
+class HNSWIndex:
+    """
+    HNSW graph over the normalized rows, backed by faiss (faiss-cpu, already used by rag_app).
+    ef_search trades latency for recall.
+    """
+    kind = "hnsw"
+
+    def __init__(self, index, ef_search: int = 64):
+        self.index = index
+        self.ef_search = ef_search
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, m: int = 32, ef_construction: int = 200, ef_search: int = 64) -> "HNSWIndex":
+        """
+        Insert every L2-normalized row into an inner-product HNSW graph.
+        Args:
+            matrix: Embeddings of shape (N, D), possibly memory-mapped
+            m: Graph degree
+            ef_construction: Candidate list size while building
+            ef_search: Candidate list size while searching
+        Returns:
+            HNSWIndex
+        """
+        import faiss
+        index = faiss.IndexHNSWFlat(matrix.shape[1], m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+        for _, chunk in _normalized_chunks(matrix):
+            index.add(chunk)
+        return cls(index, ef_search)
+
+    def candidates(self, query_vec: np.ndarray, n: int) -> np.ndarray:
+        """
+        Approximate n nearest rows of a normalized query.
+        Args:
+            query_vec: L2-normalized query of shape (D,)
+            n: Number of candidates
+        Returns:
+            Array of candidate row ids
+        """
+        self.index.hnsw.efSearch = max(self.ef_search, n)
+        _, ids = self.index.search(query_vec[None, :].astype(np.float32), n)
+        return ids[0][ids[0] >= 0]
+
+    def save(self, path: str):
+        import faiss
+        faiss.write_index(self.index, path)
+
+    @classmethod
+    def load(cls, path: str, ef_search: int = 64) -> "HNSWIndex":
+        import faiss
+        return cls(faiss.read_index(path), ef_search)
+
+def build_ann_index(matrix: np.ndarray, kind: str, **kwargs):
+    """
+    Build an approximate nearest-neighbour index over a matrix.
+    Args:
+        matrix: Embeddings of shape (N, D), possibly memory-mapped
+        kind: "ivf" (pure NumPy) or "hnsw" (faiss)
+        **kwargs: Index options, e.g. nlist/nprobe or m/ef_search
+    Returns:
+        IVFIndex or HNSWIndex
+    """
+    if kind == "ivf":
+        return IVFIndex.build(matrix, **kwargs)
+    if kind == "hnsw":
+        return HNSWIndex.build(matrix, **kwargs)
+    raise ValueError(f"Unknown ANN index {kind!r}, expected one of {ANN_KINDS}")
+
+def ann_index_path(embedding_file: str, kind: str) -> str:
+    """Where the ANN index for an embeddings .npy file lives, e.g. embeddings.ivf.npz."""
+    root, _ = os.path.splitext(embedding_file)
+    return f"{root}.{kind}.npz" if kind == "ivf" else f"{root}.{kind}.faiss"
+
+def load_or_build_ann_index(embedding_file: str, kind: str, matrix: Optional[np.ndarray] = None, **kwargs):
+    """
+    Load the ANN index saved next to an embeddings file, rebuilding it if missing or older.
+    Args:
+        embedding_file: Path of the .npy embeddings the index covers
+        kind: "ivf" or "hnsw"
+        matrix: The embeddings, loaded from embedding_file if not given
+        **kwargs: Build options; nprobe/ef_search also apply to a loaded index
+    Returns:
+        IVFIndex or HNSWIndex
+    """
+    path = ann_index_path(embedding_file, kind)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(embedding_file):
+        index = IVFIndex.load(path) if kind == "ivf" else HNSWIndex.load(path)
+        if "nprobe" in kwargs:
+            index.nprobe = kwargs["nprobe"]
+        if "ef_search" in kwargs:
+            index.ef_search = kwargs["ef_search"]
+        return index
+    if matrix is None:
+        matrix = np.load(embedding_file, mmap_mode="r")
+    index = build_ann_index(matrix, kind, **kwargs)
+    index.save(path)
+    return index
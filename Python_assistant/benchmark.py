@@ -0,0 +1,573 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import unicodedata
+from typing import List, Dict, Callable
+
+
+def load_qa_pairs(file_path: str) -> List[Dict]:
+    """Load QA pairs from JSON file with explicit UTF-8 encoding."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def time_call(fn: Callable, repeat: int = 3) -> float:
+    """
+    Run a callable several times and return the best wall-clock time.
+    Args:
+        fn: Zero-argument callable to time
+        repeat: Number of runs
+    Returns:
+        Fastest run in seconds
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_preprocess(qa_pairs: List[Dict], batch_size: int, n_process: int, repeat: int):
+    """Compare the per-pair preprocessing loop with the batched nlp.pipe pipeline."""
+    from preprocess import preprocess_text, preprocess_qa_pairs
+
+    def per_pair():
+        for pair in qa_pairs:
+            preprocess_text(pair["question"])
+            preprocess_text(pair["answer"])
+
+    def batched():
+        preprocess_qa_pairs(qa_pairs, batch_size=batch_size, n_process=n_process)
+
+    # Load the model before timing anything
+    preprocess_text("warm up")
+    n = len(qa_pairs)
+    per_pair_time = time_call(per_pair, repeat)
+    batched_time = time_call(batched, repeat)
+    print(f"Pairs: {n}")
+    print(f"Per-pair loop: {n / per_pair_time:10.1f} pairs/sec")
+    print(f"Batched pipe:  {n / batched_time:10.1f} pairs/sec "
+          f"(batch_size={batch_size}, n_process={n_process})")
+    print(f"Speedup: {per_pair_time / batched_time:.2f}x")
+
+def clean_utf8_text_reference(text: str) -> str:
+    """The original multi-pass clean_utf8_text, kept to check the fast version against."""
+    text = text.replace("’", "'")
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return "".join(c for c in text if unicodedata.category(c) != "Cc")
+
+CLEAN_EDGE_CASES = [
+    "",
+    "plain ascii",
+    "tab\tnew\nline\r\x00\x7f",
+    "Algorand’s “ARC” – café ﬁnance ½ \u00a0 \u0085 \u200b",
+    "ＡＲＣ－００６９ 🚀 naïve Ω",
+]
+
+def load_arc_texts(arc_file: str, qa_pairs: List[Dict]) -> List[str]:
+    """
+    Load the scraped ARC pages as a list of texts, falling back to the QA corpus.
+    Args:
+        arc_file: Path to the arc_standards.jsonl page log written by Scraping_ARC_Data/scrape_data.py
+            (or an older arc_standards.json list of pages)
+        qa_pairs: QA pairs used when the scraped corpus is not available
+    Returns:
+        List of texts to clean
+    """
+    if os.path.exists(arc_file):
+        with open(arc_file, 'r', encoding='utf-8') as f:
+            if arc_file.endswith(".jsonl"):
+                # Latest version of each page; deleted pages are dropped
+                latest = {}
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        latest[entry["url"]] = None if entry.get("deleted") else entry
+                pages = [page for page in latest.values() if page is not None]
+            else:
+                pages = json.load(f)
+        return [page["title"] for page in pages] + [page["content"] for page in pages]
+    print(f"{arc_file} not found, using the QA corpus instead")
+    return [pair["question"] for pair in qa_pairs] + [pair["answer"] for pair in qa_pairs]
+
+def bench_clean(texts: List[str], repeat: int):
+    """Check clean_utf8_text/clean_many against the original output, then time them."""
+    from preprocess import clean_utf8_text, clean_many
+
+    for text in CLEAN_EDGE_CASES + texts:
+        expected = clean_utf8_text_reference(text)
+        assert clean_utf8_text(text) == expected, f"clean_utf8_text differs on {text[:80]!r}"
+    assert clean_many(texts) == [clean_utf8_text_reference(text) for text in texts]
+    print(f"Output identical to the reference on {len(texts)} texts")
+
+    n_chars = sum(len(text) for text in texts)
+    timings = [
+        ("reference", time_call(lambda: [clean_utf8_text_reference(text) for text in texts], repeat)),
+        ("clean_utf8_text", time_call(lambda: [clean_utf8_text(text) for text in texts], repeat)),
+        ("clean_many", time_call(lambda: clean_many(texts), repeat)),
+    ]
+    for label, elapsed in timings:
+        print(f"{label:16s} {elapsed * 1000:9.2f} ms  {n_chars / elapsed / 1e6:8.2f} Mchars/sec")
+
+def make_paraphrase_queries(qa_pairs: List[Dict]) -> List[str]:
+    """
+    Derive one deterministic, lightly reworded query per question.
+    Every fourth word is dropped and the text lowercased, so query i should retrieve question i.
+    """
+    queries = []
+    for pair in qa_pairs:
+        words = pair["question"].lower().split()
+        kept = [word for i, word in enumerate(words) if i % 4 != 3]
+        queries.append(" ".join(kept or words))
+    return queries
+
+def bench_embedders(qa_pairs: List[Dict], names: List[str], repeat: int):
+    """Compare embedding backends on throughput and paraphrase top-1 accuracy."""
+    import numpy as np
+    from embedders import EMBEDDERS, get_embedder
+
+    questions = [pair["question"] for pair in qa_pairs]
+    queries = make_paraphrase_queries(qa_pairs)
+    print(f"{'backend':24s} {'dim':>6s} {'dtype':>8s} {'batch':>6s} {'texts/sec':>10s} {'top-1':>6s}")
+    for name in names or sorted(EMBEDDERS):
+        try:
+            embedder = get_embedder(name)
+            embedder.embed(questions[:1])
+        except Exception as e:
+            print(f"{name:24s} skipped: {e}")
+            continue
+        elapsed = time_call(lambda: embedder.embed(questions), repeat)
+        docs = embedder.embed(questions)
+        docs = docs / np.maximum(np.linalg.norm(docs, axis=1, keepdims=True), 1e-10)
+        top1 = (embedder.embed(queries) @ docs.T).argmax(axis=1)
+        accuracy = float(np.mean(top1 == np.arange(len(queries))))
+        print(f"{name:24s} {embedder.dimension:6d} {np.dtype(embedder.dtype).name:>8s} "
+              f"{embedder.batch_size:6d} {len(questions) / elapsed:10.1f} {accuracy:6.3f}")
+
+def bench_search(sizes: List[int], dim: int, repeat: int, n_queries: int):
+    """
+    Per-query latency of the original find_best_match scoring against SimilarityIndex,
+    then throughput of one-at-a-time queries against blocked batch search.
+    """
+    import numpy as np
+    from similarity_search import SimilarityIndex, cosine_similarity_matrix
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>9s} {'original':>12s} {'index':>12s} {'speedup':>8s}")
+    for n in sizes:
+        matrix = rng.standard_normal((n, dim), dtype=np.float32)
+        qa_pairs = [{"question_embedding": row} for row in matrix]
+        query = rng.standard_normal(dim, dtype=np.float32)
+
+        def original():
+            # What find_best_match did on every query before SimilarityIndex
+            embeddings_matrix = np.array([pair["question_embedding"] for pair in qa_pairs])
+            return int(np.argmax(cosine_similarity_matrix(query, embeddings_matrix)))
+
+        index = SimilarityIndex(matrix, qa_pairs)
+        assert index.search_vector(query, 1)[0][0] == original()
+        original_time = time_call(original, repeat)
+        index_time = time_call(lambda: index.search_vector(query, 10), repeat)
+        print(f"{n:9d} {original_time * 1000:9.3f} ms {index_time * 1000:9.3f} ms {original_time / index_time:7.1f}x")
+
+    if n_queries:
+        queries = rng.standard_normal((n_queries, dim), dtype=np.float32)
+        loop_time = time_call(lambda: [index.search_vector(q, 10) for q in queries], repeat)
+        batch_time = time_call(lambda: index.search_vectors(queries, 10), repeat)
+        print(f"{n_queries} queries over {len(index)} rows: "
+              f"{n_queries / loop_time:10.1f} queries/sec one at a time, "
+              f"{n_queries / batch_time:10.1f} queries/sec batched")
+
+def bench_quantize(qa_pairs: List[Dict], embedder_name: str, k: int, rerank: int, distractors: int):
+    """Memory and recall@k of quantized SimilarityIndex scoring against exact float32 search."""
+    import numpy as np
+    from embedders import get_embedder
+    from similarity_search import SimilarityIndex
+
+    embedder = get_embedder(embedder_name)
+    matrix = embedder.embed([pair["question"] for pair in qa_pairs])
+    if distractors:
+        # Pad the corpus with random unit rows so candidate selection has something to get wrong
+        rng = np.random.default_rng(0)
+        noise = rng.standard_normal((distractors, matrix.shape[1]), dtype=np.float32)
+        matrix = np.vstack([matrix, noise / np.linalg.norm(noise, axis=1, keepdims=True)])
+    queries = embedder.embed(make_paraphrase_queries(qa_pairs))
+    targets = np.arange(len(qa_pairs))
+
+    exact = SimilarityIndex(matrix, qa_pairs)
+    _, exact_scores = exact.search_vectors(queries, k)
+    print(f"{embedder.model_id}: {matrix.shape[0]} rows x {matrix.shape[1]} dims, k={k}")
+    print(f"{'scoring':18s} {'memory':>10s} {'ratio':>6s} {'recall@k':>9s} {'hit@k':>6s}")
+    for label, quantization, candidates in [
+        ("float32", None, k),
+        ("float16", "float16", k),
+        ("int8", "int8", k),
+        (f"float16+rerank{rerank}", "float16", rerank),
+        (f"int8+rerank{rerank}", "int8", rerank),
+    ]:
+        index = SimilarityIndex(matrix, qa_pairs, quantization=quantization, rerank=candidates)
+        idx, scores = index.search_vectors(queries, k)
+        # recall@k: share of results that belong in the exact float32 top-k (ties count, and
+        # returned scores are always exact float32 cosines); hit@k: the paraphrased question is in the top-k
+        recall = np.mean(scores >= exact_scores[:, -1:] - 1e-6)
+        hits = np.mean([target in row for target, row in zip(targets, idx)])
+        print(f"{label:18s} {index.nbytes / 1024:8.1f}KB {exact.nbytes / index.nbytes:5.1f}x {recall:9.4f} {hits:6.3f}")
+
+def bench_ann(n: int, dim: int, n_queries: int, k: int, nprobes: List[int], ef_searches: List[int]):
+    """Recall@k and per-query latency of the ANN modes against the exact scan, on clustered random data."""
+    import numpy as np
+    from ann_index import build_ann_index
+    from similarity_search import SimilarityIndex
+
+    rng = np.random.default_rng(0)
+    # Gaussian clusters look more like sentence embeddings than uniform noise does
+    centers = rng.standard_normal((max(1, n // 100), dim), dtype=np.float32)
+    matrix = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.standard_normal((n, dim), dtype=np.float32)
+    queries = matrix[rng.integers(n, size=n_queries)] + 0.3 * rng.standard_normal((n_queries, dim), dtype=np.float32)
+
+    exact = SimilarityIndex(matrix, [None] * n)
+    start = time.perf_counter()
+    truth = [set(exact.search_vector(q, k)[0]) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / n_queries
+    print(f"{n} rows x {dim} dims, {n_queries} queries, k={k}")
+    print(f"{'mode':18s} {'recall@k':>9s} {'ms/query':>9s} {'speedup':>8s}")
+    print(f"{'exact':18s} {1.0:9.4f} {exact_ms:9.3f} {1.0:7.1f}x")
+
+    def run(label, index):
+        start = time.perf_counter()
+        found = [set(index.search_vector(q, k)[0]) for q in queries]
+        ms = (time.perf_counter() - start) * 1000 / n_queries
+        recall = np.mean([len(f & t) / k for f, t in zip(found, truth)])
+        print(f"{label:18s} {recall:9.4f} {ms:9.3f} {exact_ms / ms:7.1f}x")
+
+    start = time.perf_counter()
+    ivf = build_ann_index(matrix, "ivf")
+    print(f"IVF build: {time.perf_counter() - start:.1f}s, {len(ivf.centroids)} lists")
+    for nprobe in nprobes:
+        ivf.nprobe = nprobe
+        run(f"ivf nprobe={nprobe}", SimilarityIndex(matrix, [None] * n, ann=ivf))
+    try:
+        start = time.perf_counter()
+        hnsw = build_ann_index(matrix, "hnsw")
+    except ImportError:
+        print("hnsw skipped: faiss is not installed")
+        return
+    print(f"HNSW build: {time.perf_counter() - start:.1f}s")
+    for ef_search in ef_searches:
+        hnsw.ef_search = ef_search
+        run(f"hnsw ef={ef_search}", SimilarityIndex(matrix, [None] * n, ann=hnsw, rerank=k))
+
+def bench_ollama(qa_pairs: List[Dict], concurrencies: List[int], batch_size: int, base_url: str,
+                 latency: float, fail_rate: float):
+    """Throughput of the bulk Ollama embedder at several concurrency levels, against a stub server by default."""
+    from ollama_bulk import AsyncOllamaEmbedder, start_stub_server
+
+    server = None
+    if not base_url:
+        server, base_url = start_stub_server(latency=latency, fail_rate=fail_rate)
+    texts = [pair["question"] for pair in qa_pairs]
+    print(f"{len(texts)} texts, batch size {batch_size}, {base_url}")
+    print(f"{'concurrency':>11s} {'seconds':>8s} {'texts/sec':>10s} {'retries':>8s}")
+    try:
+        for concurrency in concurrencies:
+            embedder = AsyncOllamaEmbedder(base_url=base_url, batch_size=batch_size, concurrency=concurrency,
+                                           backoff=0.05, report_every=0)
+            embedder.embed(texts)
+            stats = embedder.stats
+            print(f"{concurrency:11d} {stats['seconds']:8.2f} {stats['texts_per_sec']:10.1f} {stats['retries']:8d}")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+def bench_elastic(qa_pairs: List[Dict], chunk_sizes: List[int], thread_counts: List[int], url: str, latency: float):
+    """Bulk indexing throughput per chunk size and worker count, against a stub server by default."""
+    from elasticsearch import Elasticsearch
+    from elastic_search import bulk_index, setup_elasticsearch_index, start_stub_server
+
+    server = None
+    if not url:
+        server, url = start_stub_server(latency=latency)
+    es = Elasticsearch([url], connections_per_node=max(10, *thread_counts))
+    index_name = "qa_pairs_benchmark"
+    # One full setup checks the versioned load and alias swap; the runs below time the bulk load alone
+    setup_elasticsearch_index(qa_pairs, index_name, es=es)
+    docs = [{"question": pair["question"], "original_question": pair["question"], "answer": pair["answer"]}
+            for pair in qa_pairs]
+    print(f"{len(docs)} documents, {url}")
+    print(f"{'chunk':>6s} {'threads':>8s} {'seconds':>8s} {'docs/sec':>10s}")
+    try:
+        for chunk_size in chunk_sizes:
+            for thread_count in thread_counts:
+                target = f"{index_name}-bench"
+                es.indices.create(index=target, settings={"index": {"refresh_interval": "-1"}})
+                try:
+                    stats = bulk_index(es, target, docs, chunk_size, thread_count)
+                finally:
+                    es.indices.delete(index=target)
+                print(f"{chunk_size:6d} {thread_count:8d} {stats['seconds']:8.2f} {stats['docs_per_sec']:10.0f}")
+    finally:
+        for index in es.indices.get_alias(name=index_name):
+            es.indices.delete(index=index)
+        if server is not None:
+            server.shutdown()
+
+def bench_hybrid(qa_pairs: List[Dict], embedder_name: str, k: int, rows: int, n_queries: int, nprobe: int):
+    """
+    hit@k of BM25, dense and hybrid retrieval on paraphrased questions, then per-query latency
+    of each with the corpus padded to `rows` documents of random corpus words.
+    """
+    import numpy as np
+    from ann_index import build_ann_index
+    from bm25_index import BM25Index
+    from embedders import get_embedder
+    from hybrid_search import HybridIndex
+    from preprocess_cache import cached_preprocess_texts
+    from similarity_search import SimilarityIndex
+
+    embedder = get_embedder(embedder_name)
+    processed = cached_preprocess_texts(pair["question"] for pair in qa_pairs)
+    records = [{"question": text, "original_question": pair["question"], "original_answer": pair["answer"]}
+               for text, pair in zip(processed, qa_pairs)]
+    queries = cached_preprocess_texts(make_paraphrase_queries(qa_pairs))
+    matrix = embedder.embed(processed)
+    query_vecs = embedder.embed(queries)
+    index = HybridIndex(records, SimilarityIndex(matrix, records), candidates=max(50, k))
+
+    hits = {"bm25": 0, "dense": 0, "hybrid": 0}
+    for target, (query, vec) in enumerate(zip(queries, query_vecs)):
+        hits["bm25"] += target in index.bm25.search(query, k)[0]
+        hits["dense"] += target in index.dense.search_vector(vec, k)[0]
+        hits["hybrid"] += target in [r["index"] for r in index.search_processed(query, vec, k)]
+    print(f"{embedder.model_id}: {len(records)} questions, paraphrased queries")
+    print("  ".join(f"{name} hit@{k}: {count / len(queries):.3f}" for name, count in hits.items()))
+
+    # Latency at scale: distractor documents built from the corpus vocabulary
+    rng = np.random.default_rng(0)
+    vocabulary = sorted({word for text in processed for word in text.split()})
+    lengths = [len(text.split()) for text in processed]
+    padding = rows - len(records)
+    texts = [" ".join(rng.choice(vocabulary, size=rng.choice(lengths))) for _ in range(max(0, padding))]
+    noise = rng.standard_normal((len(texts), matrix.shape[1]), dtype=np.float32)
+    big_matrix = np.vstack([matrix, noise / np.linalg.norm(noise, axis=1, keepdims=True)]).astype(np.float32)
+    big_records = records + [{"question": t, "original_question": t, "original_answer": ""} for t in texts]
+    start = time.perf_counter()
+    bm25 = BM25Index.build([record["question"] for record in big_records])
+    print(f"{len(big_records)} documents, BM25 build {time.perf_counter() - start:.1f}s")
+
+    sample = rng.choice(len(queries), size=min(n_queries, len(queries)), replace=False)
+
+    def latency(fn):
+        times = []
+        for i in sample:
+            start = time.perf_counter()
+            fn(queries[i], query_vecs[i])
+            times.append(time.perf_counter() - start)
+        times = np.sort(times) * 1000
+        return times.mean(), times[min(len(times) - 1, int(0.99 * len(times)))]
+
+    print(f"{'retriever':20s} {'mean ms':>8s} {'p99 ms':>8s}")
+    dense_indexes = [("exact", SimilarityIndex(big_matrix, big_records))]
+    ivf = build_ann_index(big_matrix, "ivf", nprobe=nprobe)
+    dense_indexes.append((f"ivf nprobe={nprobe}", SimilarityIndex(big_matrix, big_records, ann=ivf)))
+    mean, p99 = latency(lambda q, v: bm25.search(q, 50))
+    print(f"{'bm25':20s} {mean:8.3f} {p99:8.3f}")
+    for label, dense in dense_indexes:
+        hybrid = HybridIndex(big_records, dense, bm25=bm25)
+        mean, p99 = latency(lambda q, v: dense.search_vector(v, 50))
+        print(f"{'dense ' + label:20s} {mean:8.3f} {p99:8.3f}")
+        mean, p99 = latency(lambda q, v: hybrid.search_processed(q, v, k))
+        print(f"{'hybrid ' + label:20s} {mean:8.3f} {p99:8.3f}")
+
+def bench_inverted(qa_pairs: List[Dict], k: int, rows: int, n_queries: int):
+    """
+    Size and per-query latency of the compressed inverted index, with and without max-score
+    pruning, against the CSR BM25Index, on the corpus padded to `rows` documents of random corpus words.
+    """
+    import tempfile
+    import numpy as np
+    from bm25_index import BM25Index, tokenize
+    from inverted_index import InvertedIndex
+    from preprocess_cache import cached_preprocess_texts
+
+    processed = cached_preprocess_texts(pair["question"] for pair in qa_pairs)
+    queries = cached_preprocess_texts(make_paraphrase_queries(qa_pairs))
+    rng = np.random.default_rng(0)
+    vocabulary = sorted({word for text in processed for word in text.split()})
+    lengths = [len(text.split()) for text in processed]
+    texts = processed + [" ".join(rng.choice(vocabulary, size=rng.choice(lengths)))
+                         for _ in range(max(0, rows - len(processed)))]
+    records = [{"question": text} for text in texts]
+
+    start = time.perf_counter()
+    index = InvertedIndex.build(texts, records)
+    build = time.perf_counter() - start
+    bm25 = BM25Index.build(texts)
+    postings = len(index.tf)
+    print(f"{len(texts)} documents, {postings} postings, build {build:.1f}s")
+    print(f"postings: {index.nbytes / 1e6:.2f} MB compressed, "
+          f"{postings * 8 / 1e6:.2f} MB as int32 ids + float32 weights")
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(directory)
+        start = time.perf_counter()
+        loaded, _ = InvertedIndex.load(directory)
+        print(f"load (memory-mapped) {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        sample = [queries[i] for i in rng.choice(len(queries), size=min(n_queries, len(queries)), replace=False)]
+        mismatches = sum(not np.allclose(np.sort(loaded.search_tokens(tokenize(query), k)[1]),
+                                         np.sort(bm25.search(query, k)[1]), atol=1e-4) for query in sample)
+        print(f"top-{k} score mismatches against BM25Index: {mismatches}/{len(sample)}")
+
+        def latency(fn):
+            times = []
+            for query in sample:
+                start = time.perf_counter()
+                fn(query)
+                times.append(time.perf_counter() - start)
+            times = np.sort(times) * 1000
+            return times.mean(), times[min(len(times) - 1, int(0.99 * len(times)))]
+
+        print(f"{'search':24s} {'mean ms':>8s} {'p99 ms':>8s}")
+        for label, fn in [("inverted, max-score", lambda q: loaded.search_tokens(tokenize(q), k)),
+                          ("inverted, exhaustive", lambda q: loaded.search_tokens(tokenize(q), k, prune=False)),
+                          ("bm25 csr", lambda q: bm25.search(q, k))]:
+            mean, p99 = latency(fn)
+            print(f"{label:24s} {mean:8.3f} {p99:8.3f}")
+
+STARTUP_SNIPPET = """
+import time
+try:
+    import resource
+except ImportError:
+    # Windows has no getrusage: report the peak of Python allocations instead of RSS
+    # (tracing them also inflates the timings, so compare Windows runs only with each other)
+    import tracemalloc
+    resource = None
+    tracemalloc.start()
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+if resource:
+    print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "RSS")
+else:
+    print(elapsed, tracemalloc.get_traced_memory()[1] // 1024, "Python heap")
+"""
+
+STARTUP_CASES = [
+    ("import clean_utf8_text", None, "from preprocess import clean_utf8_text\nclean_utf8_text('warm up')"),
+    ("preprocess_text, fast mode", "fast", "from preprocess import preprocess_text\npreprocess_text('warm up')"),
+    ("preprocess_text, full mode", "full", "from preprocess import preprocess_text\npreprocess_text('warm up')"),
+]
+
+def bench_startup(repeat: int):
+    """Measure cold-start time and peak RSS (Python heap on Windows) of each preprocess mode in fresh interpreters."""
+    for label, mode, body in STARTUP_CASES:
+        env = dict(os.environ)
+        if mode:
+            env["PREPROCESS_MODE"] = mode
+        runs = []
+        for _ in range(repeat):
+            out = subprocess.run(
+                [sys.executable, "-c", STARTUP_SNIPPET.format(body=body)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout.split(maxsplit=2)
+            runs.append((float(out[0]), int(out[1]), out[2].strip()))
+        elapsed, peak_kb, measure = min(runs)
+        print(f"{label:30s} {elapsed * 1000:9.1f} ms  {peak_kb / 1024:8.1f} MB peak {measure}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the Algorand query assistant")
+    parser.add_argument("--qa-file", default="qa_pairs.json")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=int, default=1, help="Replicate the corpus this many times")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    preprocess_parser = subparsers.add_parser("preprocess", help="Per-pair vs batched preprocessing")
+    preprocess_parser.add_argument("--batch-size", type=int, default=256)
+    preprocess_parser.add_argument("--n-process", type=int, default=1)
+    preprocess_parser.add_argument("--mode", choices=["full", "fast"], default="full")
+
+    subparsers.add_parser("startup", help="Cold import time of each preprocess mode")
+
+    clean_parser = subparsers.add_parser("clean", help="clean_utf8_text equivalence and throughput")
+    clean_parser.add_argument("--arc-file", default="../Scraping_ARC_Data/arc_standards.jsonl")
+
+    embedders_parser = subparsers.add_parser("embedders", help="Compare registered embedding backends")
+    embedders_parser.add_argument("names", nargs="*", help="Backends to run (default: all registered)")
+
+    search_parser = subparsers.add_parser("search", help="Per-query latency of find_best_match vs SimilarityIndex")
+    search_parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    search_parser.add_argument("--dim", type=int, default=512)
+    search_parser.add_argument("--queries", type=int, default=256, help="Batch size for the batched search run (0 to skip)")
+
+    quantize_parser = subparsers.add_parser("quantize", help="Memory and recall@k of int8/float16 scoring")
+    quantize_parser.add_argument("--embedder", default=None, help="Embedding backend (default: $EMBEDDER)")
+    quantize_parser.add_argument("--k", type=int, default=5)
+    quantize_parser.add_argument("--rerank", type=int, default=32)
+    quantize_parser.add_argument("--distractors", type=int, default=0)
+
+    ann_parser = subparsers.add_parser("ann", help="Recall vs latency of IVF/HNSW against the exact scan")
+    ann_parser.add_argument("--rows", type=int, default=100_000)
+    ann_parser.add_argument("--dim", type=int, default=384)
+    ann_parser.add_argument("--queries", type=int, default=200)
+    ann_parser.add_argument("--k", type=int, default=10)
+    ann_parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    ann_parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+
+    inverted_parser = subparsers.add_parser("inverted", help="Size and latency of the compressed inverted index")
+    inverted_parser.add_argument("--k", type=int, default=10)
+    inverted_parser.add_argument("--rows", type=int, default=100_000)
+    inverted_parser.add_argument("--queries", type=int, default=100)
+
+    ollama_parser = subparsers.add_parser("ollama", help="Bulk Ollama embedding throughput vs concurrency")
+    ollama_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    ollama_parser.add_argument("--batch-size", type=int, default=32)
+    ollama_parser.add_argument("--base-url", default=None, help="Real Ollama server (default: local stub)")
+    ollama_parser.add_argument("--latency", type=float, default=0.05, help="Stub seconds per request")
+    ollama_parser.add_argument("--fail-rate", type=float, default=0.05, help="Stub share of 503 responses")
+
+    elastic_parser = subparsers.add_parser("elastic", help="Elasticsearch bulk indexing throughput")
+    elastic_parser.add_argument("--chunk-size", type=int, nargs="+", default=[50, 500])
+    elastic_parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    elastic_parser.add_argument("--url", default=None, help="Real Elasticsearch (default: local stub)")
+    elastic_parser.add_argument("--latency", type=float, default=0.01, help="Stub seconds per request")
+
+    hybrid_parser = subparsers.add_parser("hybrid", help="Recall and latency of BM25, dense and RRF hybrid retrieval")
+    hybrid_parser.add_argument("--embedder", default=None, help="Embedding backend (default: $EMBEDDER)")
+    hybrid_parser.add_argument("--k", type=int, default=5)
+    hybrid_parser.add_argument("--rows", type=int, default=100_000, help="Corpus size for the latency run")
+    hybrid_parser.add_argument("--queries", type=int, default=100)
+    hybrid_parser.add_argument("--nprobe", type=int, default=8)
+
+    args = parser.parse_args()
+    qa_pairs = load_qa_pairs(args.qa_file)
+
+    if args.benchmark == "preprocess":
+        import preprocess
+        preprocess.set_model_mode(args.mode)
+        bench_preprocess(qa_pairs * args.scale, args.batch_size, args.n_process, args.repeat)
+    elif args.benchmark == "startup":
+        bench_startup(args.repeat)
+    elif args.benchmark == "clean":
+        bench_clean(load_arc_texts(args.arc_file, qa_pairs) * args.scale, args.repeat)
+    elif args.benchmark == "embedders":
+        bench_embedders(qa_pairs * args.scale, args.names, args.repeat)
+    elif args.benchmark == "search":
+        bench_search(args.sizes, args.dim, args.repeat, args.queries)
+    elif args.benchmark == "quantize":
+        bench_quantize(qa_pairs, args.embedder, args.k, args.rerank, args.distractors)
+    elif args.benchmark == "ann":
+        bench_ann(args.rows, args.dim, args.queries, args.k, args.nprobe, args.ef_search)
+    elif args.benchmark == "hybrid":
+        bench_hybrid(qa_pairs, args.embedder, args.k, args.rows, args.queries, args.nprobe)
+    elif args.benchmark == "inverted":
+        bench_inverted(qa_pairs, args.k, args.rows, args.queries)
+    elif args.benchmark == "elastic":
+        bench_elastic(qa_pairs * args.scale, args.chunk_size, args.threads, args.url, args.latency)
+    elif args.benchmark == "ollama":
+        bench_ollama(qa_pairs * args.scale, args.concurrency, args.batch_size, args.base_url,
+                     args.latency, args.fail_rate)
+
+if __name__ == "__main__":
+    main()
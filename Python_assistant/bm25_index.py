@@ -0,0 +1,124 @@
+import re
+import numpy as np
+import scipy.sparse as sp
+from typing import Dict, List, Sequence, Tuple
+from top_k import top_k_indices
+
+# Same tokens as tf_idf
+_TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+def term_statistics(texts: Sequence[str]) -> Tuple[Dict[str, int], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Tokenize documents and count their terms.
+    Args:
+        texts: One already-preprocessed text per document
+    Returns:
+        Tuple of (vocabulary term -> id, then one entry per (term, document) posting: term ids,
+        document ids and term frequencies, and the token count per document)
+    """
+    vocabulary: Dict[str, int] = {}
+    term_ids, doc_ids, counts = [], [], []
+    doc_lengths = np.zeros(len(texts), dtype=np.float32)
+    for doc, text in enumerate(texts):
+        tokens = tokenize(text)
+        doc_lengths[doc] = len(tokens)
+        tf: Dict[int, int] = {}
+        for token in tokens:
+            term = vocabulary.setdefault(token, len(vocabulary))
+            tf[term] = tf.get(term, 0) + 1
+        term_ids.extend(tf)
+        doc_ids.extend([doc] * len(tf))
+        counts.extend(tf.values())
+    return (vocabulary, np.array(term_ids, dtype=np.int64), np.array(doc_ids, dtype=np.int64),
+            np.array(counts, dtype=np.int64), doc_lengths)
+
+def length_norm(doc_lengths: np.ndarray, k1: float, b: float) -> np.ndarray:
+    """BM25 length normalization per document: k1 * (1 - b + b * length / average length)."""
+    avg_length = max(float(doc_lengths.mean()) if len(doc_lengths) else 0.0, 1e-10)
+    return (k1 * (1 - b + b * doc_lengths / avg_length)).astype(np.float32)
+
+def term_weight(idf, tf: np.ndarray, norm: np.ndarray, k1: float) -> np.ndarray:
+    """BM25 weight of postings, from their term's idf, term frequency and document length_norm."""
+    tf = np.asarray(tf, dtype=np.float32)
+    return idf * tf * (k1 + 1) / (tf + norm)
+
+def bm25_weights(term_ids: np.ndarray, doc_ids: np.ndarray, tf: np.ndarray, doc_lengths: np.ndarray,
+                 n_terms: int, k1: float, b: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lucene-style BM25 weights of postings as returned by term_statistics, in any order.
+    Returns:
+        Tuple of (idf per term, float32 weight per posting)
+    """
+    df = np.bincount(term_ids, minlength=n_terms)
+    # Lucene's non-negative idf
+    idf = np.log1p((len(doc_lengths) - df + 0.5) / (df + 0.5)).astype(np.float32)
+    weights = term_weight(idf[term_ids], tf, length_norm(doc_lengths, k1, b)[doc_ids], k1)
+    return idf, weights.astype(np.float32)
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index held as a sparse term x document matrix.
+    Each posting stores its precomputed BM25 term weight, so a query only sums
+    the postings of its own terms.
+    """
+
+    def __init__(self, postings: sp.csr_matrix, vocabulary: Dict[str, int], k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            postings: CSR matrix of shape (terms, documents); row t holds the BM25 weights of term t
+            vocabulary: Term -> row of postings
+            k1: Term-frequency saturation
+            b: Document-length normalization
+        """
+        self.postings = postings
+        self.vocabulary = vocabulary
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, texts: Sequence[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """
+        Index already-preprocessed texts.
+        Args:
+            texts: One text per document, e.g. preprocessed questions
+            k1: Term-frequency saturation
+            b: Document-length normalization
+        Returns:
+            BM25Index
+        """
+        vocabulary, rows, columns, tf, lengths = term_statistics(texts)
+        _, weights = bm25_weights(rows, columns, tf, lengths, len(vocabulary), k1, b)
+        postings = sp.csr_matrix((weights, (rows, columns)), shape=(len(vocabulary), len(texts)), dtype=np.float32)
+        return cls(postings, vocabulary, k1, b)
+
+    def __len__(self) -> int:
+        return self.postings.shape[1]
+
+    def search(self, text: str, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k documents for an already-preprocessed query.
+        Args:
+            text: Query text, preprocessed like the indexed texts
+            k: Number of results
+        Returns:
+            Tuple of (document indices, BM25 scores), best first; documents sharing no term are left out
+        """
+        terms: Dict[int, int] = {}
+        for token in tokenize(text):
+            term = self.vocabulary.get(token)
+            if term is not None:
+                terms[term] = terms.get(term, 0) + 1
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term, count in terms.items():
+            start, end = self.postings.indptr[term], self.postings.indptr[term + 1]
+            # Repeated query terms count once per occurrence
+            scores[self.postings.indices[start:end]] += count * self.postings.data[start:end]
+        indices = top_k_indices(scores, k)
+        indices = indices[scores[indices] > 0]
+        return indices, scores[indices]
@@ -1,11 +1,31 @@
-```
+import argparse
 import json
-from typing import List, Dict
-from elasticsearch import Elasticsearch
-from preprocess import preprocess_text
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Iterable, Optional, Tuple
+from elasticsearch import Elasticsearch, NotFoundError
+from elasticsearch.helpers import parallel_bulk
+from preprocess_cache import cached_preprocess_texts
 import nltk
 nltk.download('punkt')
 
+DEFAULT_ES_URL = os.environ.get("ELASTICSEARCH_URL", "http://localhost:9200")
+# Documents per _bulk request
+CHUNK_SIZE = 500
+# _bulk requests in flight at once
+THREAD_COUNT = 4
+
+MAPPING = {
+    "properties": {
+        "question": {"type": "text"},
+        "original_question": {"type": "keyword"},
+        "answer": {"type": "text"}
+    }
+}
+
 def load_qa_pairs(file_path: str) -> List[Dict]:
     """Load QA pairs from JSON file with explicit UTF-8 encoding."""
     try:
@@ -15,49 +35,97 @@ def load_qa_pairs(file_path: str) -> List[Dict]:
         print(f"Error loading JSON file: {e}")
         return []
 
-def setup_elasticsearch_index(qa_pairs: List[Dict], index_name: str = "qa_pairs"):
-    """Index QA pairs in Elasticsearch."""
-    es = Elasticsearch(["http://localhost:9200"])
-    if es.indices.exists(index=index_name):
+def bulk_index(es: Elasticsearch, index: str, docs: Iterable[Dict], chunk_size: int = CHUNK_SIZE,
+               thread_count: int = THREAD_COUNT) -> Dict:
+    """
+    Index documents through the _bulk API, with several bulk requests in flight.
+    Args:
+        es: Elasticsearch client
+        index: Target index
+        docs: Documents; their position is used as the id
+        chunk_size: Documents per bulk request
+        thread_count: Bulk requests in flight at once
+    Returns:
+        Dict with docs, errors, seconds and docs_per_sec
+    """
+    actions = ({"_index": index, "_id": i, "_source": doc} for i, doc in enumerate(docs))
+    start = time.perf_counter()
+    indexed = errors = 0
+    # Failed items are reported instead of raised, so one bad document does not stop the load
+    for ok, item in parallel_bulk(es, actions, thread_count=thread_count, chunk_size=chunk_size,
+                                  raise_on_error=False):
+        indexed += 1
+        if not ok:
+            errors += 1
+            if errors <= 5:
+                print(f"Error indexing data: {item}")
+    seconds = time.perf_counter() - start
+    return {"docs": indexed, "errors": errors, "seconds": seconds,
+            "docs_per_sec": indexed / seconds if seconds > 0 else 0.0}
+
+def setup_elasticsearch_index(qa_pairs: List[Dict], index_name: str = "qa_pairs", es: Optional[Elasticsearch] = None,
+                              chunk_size: int = CHUNK_SIZE, thread_count: int = THREAD_COUNT):
+    """
+    Index QA pairs in Elasticsearch behind the alias `index_name`.
+    Each call loads a new versioned index (refresh off during the load), then moves the alias
+    to it in one atomic update and deletes the versions it replaced, so searches on the alias
+    never see an empty or half-built index. If the load or the swap fails, the new version is
+    deleted and the alias keeps pointing at the previous one.
+    Args:
+        qa_pairs: List of QA pairs
+        index_name: Alias that searches use
+        es: Client to use; defaults to one for $ELASTICSEARCH_URL
+        chunk_size: Documents per bulk request
+        thread_count: Bulk requests in flight at once
+    Returns:
+        (es, index_name)
+    """
+    if es is None:
+        es = Elasticsearch([DEFAULT_ES_URL], connections_per_node=max(10, thread_count))
+    # Preprocess before creating the versioned index, so a failure here leaves nothing behind
+    preprocessed_questions = cached_preprocess_texts(pair["question"] for pair in qa_pairs)
+    docs = ({"question": preprocessed_question, "original_question": pair["question"], "answer": pair["answer"]}
+            for pair, preprocessed_question in zip(qa_pairs, preprocessed_questions))
+    version = f"{index_name}-v{int(time.time() * 1000)}"
+    es.indices.create(index=version, mappings=MAPPING, settings={"index": {"refresh_interval": "-1"}})
+    try:
+        stats = bulk_index(es, version, docs, chunk_size, thread_count)
+        if stats["errors"]:
+            raise RuntimeError(f"{stats['errors']} of {stats['docs']} documents failed to index")
+        # Back to the default refresh interval, and make everything searchable before the swap
+        es.indices.put_settings(index=version, settings={"index": {"refresh_interval": None}})
+        es.indices.refresh(index=version)
+        print(f"Indexed {stats['docs']} documents into {version} in {stats['seconds']:.2f}s "
+              f"({stats['docs_per_sec']:.0f} docs/sec)")
+
         try:
-            es.indices.delete(index=index_name)
+            previous = list(es.indices.get_alias(name=index_name))
+        except NotFoundError:
+            previous = []
+        actions = [{"add": {"index": version, "alias": index_name}}]
+        actions += [{"remove": {"index": old, "alias": index_name}} for old in previous]
+        if not previous and es.indices.exists(index=index_name):
+            # A plain index from before aliases were used: drop it in the same atomic update
+            actions.append({"remove_index": {"index": index_name}})
+        es.indices.update_aliases(actions=actions)
+    except Exception:
+        # The alias still points at the previous version; a failed cleanup must not hide the original error
+        try:
+            es.indices.delete(index=version)
         except Exception as e:
-            print(f"Error deleting existing index: {e}")
-    
-    mapping = {
-        "mappings": {
-            "properties": {
-                "question": {"type": "text"},
-                "original_question": {"type": "keyword"},
-                "answer": {"type": "text"}
-            }
-        }
-    }
-    try:
-        es.indices.create(index=index_name, body=mapping)
-    except Exception as e:
-        print(f"Error creating index: {e}")
-    
-    for i, pair in enumerate(qa_pairs):
-        raw_question = pair["question"]
-        preprocessed_question = preprocess_text(raw_question)
-        doc = {
-            "question": preprocessed_question,
-            "original_question": raw_question,
-            "answer": pair["answer"]
-        }
+            print(f"Error deleting failed index {version}: {e}")
+        raise
+    for old in previous:
         try:
-            es.index(index=index_name, id=i, body=doc)
-            print(f"Indexed Raw Question: {raw_question}")
-            print(f"Indexed Preprocessed Question: {preprocessed_question}")
+            es.indices.delete(index=old)
         except Exception as e:
-            print(f"Error indexing data: {e}")
-    
+            print(f"Error deleting old index {old}: {e}")
+
     return es, index_name
 
 def elasticsearch_search(query: str, es, index_name: str):
     tokens = nltk.word_tokenize(query)
-    
+
     q = {
         "multi_match": {
             "query": {"match": {"question": tokens}},
@@ -65,16 +133,199 @@ def elasticsearch_search(query: str, es, index_name: str):
         }
     }
     res = es.search(index=index_name, body={"query": q})
-    
+
     if not res["hits"]["hits"]:
         return None
     else:
         return res["hits"]["hits"][0]["_source"]["answer"], res["hits"]["hits"][0]["_score"]
 
+def start_stub_server(latency: float = 0.0, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Serve an in-memory stand-in for the parts of the Elasticsearch REST API used here
+    (index create/delete/exists/settings/refresh, _bulk, aliases and a token-overlap _search),
+    in a background thread, for tests and benchmarks. Documents only become searchable on
+    refresh while an index has refresh disabled, as in Elasticsearch.
+    Args:
+        latency: Seconds each request takes, imitating network and cluster time
+        port: Port to listen on, 0 picks a free one
+    Returns:
+        (server, url); call server.shutdown() to stop it
+    """
+    indices: Dict[str, Dict] = {}
+    aliases: Dict[str, set] = {}
+    lock = threading.Lock()
+
+    def resolve(name: str) -> List[str]:
+        return sorted(aliases.get(name, ())) or ([name] if name in indices else [])
+
+    def strings(value) -> List[str]:
+        if isinstance(value, str):
+            return [value]
+        if isinstance(value, dict):
+            value = list(value.values())
+        return [s for item in value for s in strings(item)] if isinstance(value, list) else []
+
+    def bulk(body: bytes, default_index: Optional[str]) -> Tuple[int, Dict]:
+        lines = [json.loads(line) for line in body.splitlines() if line.strip()]
+        items, errors = [], False
+        with lock:
+            for action, source in zip(lines[::2], lines[1::2]):
+                meta = action["index"]
+                name = meta.get("_index", default_index)
+                if name not in indices:
+                    errors = True
+                    items.append({"index": {"_index": name, "_id": meta.get("_id"), "status": 404,
+                                            "error": {"type": "index_not_found_exception"}}})
+                    continue
+                index = indices[name]
+                doc_id = str(meta.get("_id", len(index["docs"])))
+                created = doc_id not in index["docs"]
+                index["docs"][doc_id] = source
+                if index["settings"].get("refresh_interval") != "-1":
+                    index["visible"] = dict(index["docs"])
+                items.append({"index": {"_index": name, "_id": doc_id, "status": 201 if created else 200,
+                                        "result": "created" if created else "updated"}})
+        return 200, {"took": 1, "errors": errors, "items": items}
+
+    def search(name: str, body: Dict) -> Tuple[int, Dict]:
+        targets = resolve(name)
+        if not targets:
+            return 404, {"error": {"type": "index_not_found_exception"}, "status": 404}
+        terms = {t for s in strings(body.get("query", {})) for t in re.findall(r"\w+", s.lower())}
+        hits = []
+        with lock:
+            for target in targets:
+                for doc_id, source in indices[target]["visible"].items():
+                    score = len(terms & set(re.findall(r"\w+", source.get("question", "").lower())))
+                    if score:
+                        hits.append({"_index": target, "_id": doc_id, "_score": float(score), "_source": source})
+        hits.sort(key=lambda hit: -hit["_score"])
+        return 200, {"took": 1, "timed_out": False,
+                     "hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits[:body.get("size", 10)]}}
+
+    def update_aliases(body: Dict) -> Tuple[int, Dict]:
+        with lock:
+            for action in body["actions"]:
+                (kind, args), = action.items()
+                if args["index"] not in indices:
+                    return 404, {"error": {"type": "index_not_found_exception"}, "status": 404}
+            for action in body["actions"]:
+                (kind, args), = action.items()
+                if kind == "add":
+                    aliases.setdefault(args["alias"], set()).add(args["index"])
+                elif kind == "remove":
+                    aliases.get(args["alias"], set()).discard(args["index"])
+                elif kind == "remove_index":
+                    del indices[args["index"]]
+                    for members in aliases.values():
+                        members.discard(args["index"])
+            for alias in [alias for alias, members in aliases.items() if not members]:
+                del aliases[alias]
+        return 200, {"acknowledged": True}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Small keep-alive responses would otherwise wait on delayed ACKs
+        disable_nagle_algorithm = True
+
+        def route(self, method: str):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(latency)
+            parts = [p for p in self.path.split("?")[0].split("/") if p]
+            with_body = body and not parts[-1:] == ["_bulk"]
+            payload = json.loads(body) if with_body else {}
+            if parts == ["_bulk"] or parts[1:] == ["_bulk"]:
+                status, result = bulk(body, parts[0] if len(parts) == 2 else None)
+            elif parts == ["_aliases"]:
+                status, result = update_aliases(payload)
+            elif len(parts) == 2 and parts[0] == "_alias":
+                with lock:
+                    found = {index: {"aliases": {parts[1]: {}}} for index in sorted(aliases.get(parts[1], ()))}
+                status, result = (200, found) if found else (404, {"error": f"alias [{parts[1]}] missing", "status": 404})
+            elif len(parts) == 2 and parts[1] == "_search":
+                status, result = search(parts[0], payload)
+            elif len(parts) == 2 and parts[1] == "_refresh":
+                with lock:
+                    for target in resolve(parts[0]):
+                        indices[target]["visible"] = dict(indices[target]["docs"])
+                status, result = 200, {"_shards": {"total": 1, "successful": 1, "failed": 0}}
+            elif len(parts) == 2 and parts[1] == "_settings" and method == "PUT":
+                with lock:
+                    for target in resolve(parts[0]):
+                        settings = payload.get("index", payload)
+                        indices[target]["settings"].update(settings)
+                        if settings.get("refresh_interval") != "-1":
+                            indices[target]["visible"] = dict(indices[target]["docs"])
+                status, result = 200, {"acknowledged": True}
+            elif len(parts) == 1 and method == "PUT":
+                with lock:
+                    if parts[0] in indices or parts[0] in aliases:
+                        status, result = 400, {"error": {"type": "resource_already_exists_exception"}, "status": 400}
+                    else:
+                        settings = dict(payload.get("settings", {}).get("index", payload.get("settings", {})))
+                        indices[parts[0]] = {"settings": settings, "mappings": payload.get("mappings", {}),
+                                             "docs": {}, "visible": {}}
+                        status, result = 200, {"acknowledged": True, "index": parts[0]}
+            elif len(parts) == 1 and method == "DELETE":
+                with lock:
+                    found = parts[0] in indices
+                    indices.pop(parts[0], None)
+                    for members in aliases.values():
+                        members.discard(parts[0])
+                status, result = (200, {"acknowledged": True}) if found else \
+                    (404, {"error": {"type": "index_not_found_exception"}, "status": 404})
+            elif len(parts) == 1 and method == "HEAD":
+                status, result = (200 if resolve(parts[0]) else 404), {}
+            else:
+                status, result = 404, {"error": f"no handler for {method} {self.path}", "status": 404}
+
+            data = b"" if method == "HEAD" else json.dumps(result).encode("utf-8")
+            self.send_response(status)
+            # The official client refuses servers without this header
+            self.send_header("X-Elastic-Product", "Elasticsearch")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self.route("GET")
+
+        def do_POST(self):
+            self.route("POST")
+
+        def do_PUT(self):
+            self.route("PUT")
+
+        def do_DELETE(self):
+            self.route("DELETE")
+
+        def do_HEAD(self):
+            self.route("HEAD")
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index the QA pairs in Elasticsearch")
+    parser.add_argument("--qa-file", default="qa_pairs.json")
+    parser.add_argument("--url", default=DEFAULT_ES_URL)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--threads", type=int, default=THREAD_COUNT)
+    parser.add_argument("--stub", action="store_true", help="Serve a local stub of Elasticsearch instead")
+    args = parser.parse_args()
+
+    if args.stub:
+        server, args.url = start_stub_server()
+        print(f"Stub Elasticsearch at {args.url}")
     try:
-        es, index_name = setup_elasticsearch_index(load_qa_pairs("qa_pairs.json"))
+        es, index_name = setup_elasticsearch_index(load_qa_pairs(args.qa_file), es=Elasticsearch([args.url]),
+                                                   chunk_size=args.chunk_size, thread_count=args.threads)
         print(elasticsearch_search("What is Algorand?", es, index_name))
     except Exception as e:
         print(f"Error: {e}")
-```
\ No newline at end of file
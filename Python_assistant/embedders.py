@@ -0,0 +1,215 @@
+import abc
+import os
+import re
+import zlib
+import numpy as np
+from typing import Callable, Dict, List, Optional
+
+# Backend used when neither the caller nor the EMBEDDER environment variable picks one
+DEFAULT_EMBEDDER = "use"
+
+EMBEDDERS: Dict[str, Callable[..., "Embedder"]] = {}
+
+
+def register_embedder(name: str):
+    """
+    Class decorator adding an Embedder backend to the registry.
+    Args:
+        name: Name the backend is selected by, e.g. in the EMBEDDER environment variable
+    """
+    def decorator(cls):
+        cls.name = name
+        EMBEDDERS[name] = cls
+        return cls
+    return decorator
+
+def get_embedder(name: Optional[str] = None, default: str = DEFAULT_EMBEDDER, **kwargs) -> "Embedder":
+    """
+    Build a registered embedding backend.
+    Args:
+        name: Backend name; defaults to $EMBEDDER, then to default
+        default: Backend used by this entry point when nothing else is configured
+        **kwargs: Backend-specific options, e.g. model
+    Returns:
+        Embedder instance
+    """
+    name = name or os.environ.get("EMBEDDER", default)
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder {name!r}, expected one of {sorted(EMBEDDERS)}")
+    return EMBEDDERS[name](**kwargs)
+
+class Embedder(abc.ABC):
+    """
+    Common interface of the embedding backends.
+    Subclasses load their model lazily and must implement _embed; one that does not cannot be instantiated.
+    """
+    name = "base"
+    # Preferred number of texts per call
+    batch_size = 64
+    dtype = np.float32
+
+    def __init__(self, model: str):
+        self.model = model
+        self._dimension: Optional[int] = None
+
+    @property
+    def model_id(self) -> str:
+        """Identifier of the backend and model, stored next to persisted embeddings."""
+        return f"{self.name}:{self.model}"
+
+    @property
+    def dimension(self) -> int:
+        """Embedding size; backends that cannot tell in advance embed a probe text."""
+        if self._dimension is None:
+            self._dimension = self.embed(["dimension probe"]).shape[1]
+        return self._dimension
+
+    @abc.abstractmethod
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts with the backend; embed() fixes the dtype and shape of the result."""
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Convert texts to dense vectors.
+        Args:
+            texts: List of texts
+        Returns:
+            Array of shape (len(texts), dimension) in the backend dtype
+        """
+        vectors = np.asarray(self._embed(list(texts)), dtype=self.dtype)
+        if vectors.ndim != 2:
+            vectors = vectors.reshape(len(texts), -1)
+        self._dimension = vectors.shape[1]
+        return vectors
+
+    def as_langchain(self):
+        """Wrap the backend as a LangChain Embeddings object, e.g. for FAISS."""
+        from langchain_core.embeddings import Embeddings
+
+        embedder = self
+
+        class _LangChainEmbeddings(Embeddings):
+            def embed_documents(self, texts: List[str]) -> List[List[float]]:
+                return embedder.embed(texts).tolist()
+
+            def embed_query(self, text: str) -> List[float]:
+                return embedder.embed([text])[0].tolist()
+
+        return _LangChainEmbeddings()
+
+@register_embedder("use")
+class UniversalSentenceEncoderEmbedder(Embedder):
+    """Universal Sentence Encoder from TensorFlow Hub."""
+    batch_size = 128
+
+    def __init__(self, model: str = "https://tfhub.dev/google/universal-sentence_encoder/4"):
+        super().__init__(model)
+        self._dimension = 512
+        self._model = None
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self._model is None:
+            os.environ.setdefault('TF_ENABLE_ONEDNN_OPTS', "0")
+            import tensorflow_hub as hub
+            self._model = hub.load(self.model)
+        return self._model(texts).numpy()
+
+@register_embedder("sentence-transformers")
+class SentenceTransformerEmbedder(Embedder):
+    """Local sentence-transformers model."""
+    batch_size = 64
+
+    def __init__(self, model: str = "all-MiniLM-L6-v2"):
+        super().__init__(model)
+        self._model = None
+
+    def _load(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model)
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = self._load().get_sentence_embedding_dimension()
+        return self._dimension
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return self._load().encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+
+@register_embedder("ollama")
+class OllamaEmbedder(Embedder):
+    """
+    Embeddings served by a local Ollama instance.
+    Bulk calls go through AsyncOllamaEmbedder: concurrent batched requests over a pooled client.
+    """
+    batch_size = 32
+
+    def __init__(self, model: str = "llama3", base_url: Optional[str] = None, concurrency: int = 4):
+        super().__init__(model)
+        self.base_url = base_url or os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+        self.concurrency = concurrency
+        self._bulk = None
+        self._client = None
+
+    def _get_bulk(self):
+        if self._bulk is None:
+            from ollama_bulk import AsyncOllamaEmbedder
+            self._bulk = AsyncOllamaEmbedder(self.model, self.base_url, batch_size=self.batch_size,
+                                             concurrency=self.concurrency)
+        return self._bulk
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return self._get_bulk().embed(texts)
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """
+        Convert texts to dense vectors without blocking the caller's event loop.
+        Args:
+            texts: List of texts
+        Returns:
+            Array of shape (len(texts), dimension)
+        """
+        vectors = np.asarray(await self._get_bulk().aembed(list(texts)), dtype=self.dtype)
+        if vectors.ndim != 2:
+            vectors = vectors.reshape(len(texts), -1)
+        self._dimension = vectors.shape[1]
+        return vectors
+
+    def as_langchain(self):
+        # Hand FAISS the native client so the saved index records it
+        if self._client is None:
+            from langchain_ollama import OllamaEmbeddings
+            self._client = OllamaEmbeddings(model=self.model, base_url=self.base_url)
+        return self._client
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+@register_embedder("hashing")
+class HashingEmbedder(Embedder):
+    """
+    Pure-NumPy signed feature hashing of word unigrams and bigrams.
+    Deterministic and dependency-free, meant for offline runs and tests rather than quality.
+    """
+    batch_size = 1024
+
+    def __init__(self, dimension: int = 512):
+        super().__init__(str(dimension))
+        self._dimension = dimension
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        dim = self._dimension
+        vectors = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_PATTERN.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            if not features:
+                continue
+            # crc32 is stable across processes, unlike hash()
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features),
+                                 dtype=np.uint32, count=len(features))
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % dim, signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-10)
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from typing import Dict, Iterable, List, Optional
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+METADATA_FILE = "metadata.jsonl"
+OFFSETS_FILE = "metadata.offsets.npy"
+
+
+def corpus_hash(qa_pairs: Iterable[Dict]) -> str:
+    """
+    Hash the raw QA corpus so a store can tell whether it was built from the same data.
+    Args:
+        qa_pairs: QA pairs as loaded from qa_pairs.json
+    Returns:
+        Hex digest of the corpus
+    """
+    h = hashlib.sha256()
+    for pair in qa_pairs:
+        h.update(json.dumps([pair["question"], pair["answer"]], ensure_ascii=False).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+def document_id(pair: Dict) -> str:
+    """Content-derived id of a QA pair, so an edited pair is a new document."""
+    return hashlib.sha256(json.dumps([pair["question"], pair["answer"]], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def source_signature(path: str) -> Dict:
+    """
+    Cheap identity of a source file (size and modification time), so a store can be
+    validated from its manifest without reading and hashing the corpus.
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _atomic_write(path: str, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+class RecordStore:
+    """
+    Read-only view of the JSON Lines metadata sidecar.
+    Only the offsets are mapped on open; a record is parsed when it is accessed.
+    """
+
+    def __init__(self, directory: str):
+        self._offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        self._file = open(os.path.join(directory, METADATA_FILE), "rb")
+        # seek + read share the file position; os.pread would avoid that but does not exist on Windows
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        with self._lock:
+            self._file.seek(start)
+            line = self._file.read(end - start)
+        return json.loads(line)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        self._file.close()
+
+class EmbeddingStore:
+    """
+    Embedding matrices memory-mapped from .npy files, plus their metadata and manifest.
+    Several processes opening the same store share the matrix pages through the OS page cache.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            # Same as a missing store, so callers rebuild it
+            raise FileNotFoundError(f"Embedding store in {directory} has an old format")
+        self.directory = directory
+        self.matrices = {
+            name: np.load(os.path.join(directory, file_name), mmap_mode="r")
+            for name, file_name in self.manifest["matrices"].items()
+        }
+        self.records = RecordStore(directory)
+
+    @property
+    def model_id(self) -> str:
+        return self.manifest["model_id"]
+
+    @property
+    def dimension(self) -> int:
+        return self.manifest["dimension"]
+
+    def qa_pairs(self) -> List[Dict]:
+        """
+        Rebuild the list-of-dicts layout used by find_best_match.
+        Embeddings are row views into the mapped matrices, not copies.
+        """
+        pairs = []
+        for i, record in enumerate(self.records):
+            for name, matrix in self.matrices.items():
+                record[f"{name}_embedding"] = matrix[i]
+            pairs.append(record)
+        return pairs
+
+def save_store(directory: str, matrices: Dict[str, np.ndarray], records: List[Dict],
+               model_id: str, corpus: str, source: Optional[Dict] = None, dimension: Optional[int] = None):
+    """
+    Write an embedding store: one float32 .npy file per matrix, a JSON Lines metadata
+    sidecar with a byte-offset index, and a manifest written last so readers never see a partial store.
+    Args:
+        directory: Output directory, created if needed
+        matrices: Named embedding matrices, all with one row per record
+        records: Metadata per row, without embeddings
+        model_id: Identifier of the embedding model
+        corpus: corpus_hash of the source QA pairs
+        source: source_signature of the corpus file, checked by load_store before any hashing
+        dimension: Embedding size; only needed when there are no records to take it from
+    """
+    os.makedirs(directory, exist_ok=True)
+    file_names = {}
+    for name, matrix in matrices.items():
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if len(records) == 0:
+            # np.array([]) is 1-D; store a (0, dimension) matrix instead
+            matrix = matrix.reshape(0, dimension or 0)
+        if matrix.ndim != 2:
+            raise ValueError(f"Matrix {name!r} must be 2-D, got shape {matrix.shape}")
+        if matrix.shape[0] != len(records):
+            raise ValueError(f"Matrix {name!r} has {matrix.shape[0]} rows for {len(records)} records")
+        dimension = matrix.shape[1]
+        file_names[name] = f"{name}_embeddings.npy"
+        _atomic_write(os.path.join(directory, file_names[name]), lambda f: np.save(f, matrix))
+
+    lines = [json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n" for record in records]
+    offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+    np.cumsum([len(line) for line in lines], out=offsets[1:])
+    _atomic_write(os.path.join(directory, METADATA_FILE), lambda f: f.writelines(lines))
+    _atomic_write(os.path.join(directory, OFFSETS_FILE), lambda f: np.save(f, offsets))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "model_id": model_id,
+        "dimension": dimension,
+        "count": len(records),
+        "corpus_hash": corpus,
+        "source": source,
+        "dtype": "float32",
+        "matrices": file_names,
+    }
+    _write_manifest(directory, manifest)
+
+def _write_manifest(directory: str, manifest: Dict):
+    _atomic_write(os.path.join(directory, MANIFEST_FILE),
+                  lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+
+def update_source(store: EmbeddingStore, source: Dict):
+    """Record a new source_signature for a store whose corpus hash was confirmed unchanged."""
+    store.manifest["source"] = source
+    _write_manifest(store.directory, store.manifest)
+
+def load_store(directory: str, model_id: Optional[str] = None, corpus: Optional[str] = None,
+               source: Optional[Dict] = None) -> EmbeddingStore:
+    """
+    Open an embedding store without reading the matrices into memory.
+    Args:
+        directory: Store directory written by save_store
+        model_id: If given, the store must have been built with this model
+        corpus: If given, the store must have been built from this corpus hash
+        source: If given, the store must have been built from a file with this source_signature
+    Returns:
+        EmbeddingStore
+    Raises:
+        FileNotFoundError: If there is no store, it has an old format, or it is stale for the given model or corpus
+    """
+    if not os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        raise FileNotFoundError(f"No embedding store in {directory}")
+    store = EmbeddingStore(directory)
+    if ((model_id is not None and store.model_id != model_id)
+            or (corpus is not None and store.manifest["corpus_hash"] != corpus)
+            or (source is not None and store.manifest.get("source") != source)):
+        store.records.close()
+        raise FileNotFoundError(f"Embedding store in {directory} is stale")
+    return store
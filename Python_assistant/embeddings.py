@@ -1,65 +1,198 @@
-```python
+import hashlib
 import os
-os.environ['TF_ENABLE_ONEDNN_OPTS'] = "0"
-import tensorflow as tf
-import tensorflow_hub as hub
 import numpy as np
-from typing import List, Dict
+from itertools import chain, islice
+from typing import List, Dict, Iterable, Callable, Optional, Tuple
 import json
+from embedders import Embedder, get_embedder
 
-# Load pre-trained Sentence-BERT model from TensorFlow Hub
-model_url = "https://tfhub.dev/google/universal-sentence_encoder/4"
-embed_model = hub.load(model_url)
+_default_embedder: Optional[Embedder] = None
+
+def get_default_embedder() -> Embedder:
+    """
+    Return the process-wide embedding backend, chosen by $EMBEDDER (Universal Sentence Encoder by default).
+    The model itself is only loaded on the first embedding call.
+    """
+    global _default_embedder
+    if _default_embedder is None:
+        _default_embedder = get_embedder()
+    return _default_embedder
 
 def generate_embeddings(texts: List[str]) -> np.ndarray:
     """
-    Convert texts to dense vectors using the Sentence-BERT model.
+    Convert texts to dense vectors using the configured embedding backend.
     Args:
         texts: List of preprocessed texts
     Returns:
         Numpy array of embeddings
     """
-    return embed_model(texts).numpy()
+    return get_default_embedder().embed(texts)
+
+# Older callers use this name
+get_embeddings = generate_embeddings
+
+def _progress_path(out_path: str) -> str:
+    return out_path + ".progress.json"
+
+def _encode_batch(batch: List[str], encode_fn: Callable[[List[str]], np.ndarray],
+                  dim: Optional[int] = None) -> Tuple[np.ndarray, List[int]]:
+    """
+    Encode one batch, isolating texts that make the encoder fail.
+    Args:
+        batch: Texts to encode
+        encode_fn: Function mapping a list of texts to a 2-D array
+        dim: Embedding dimension, if already known
+    Returns:
+        Tuple of (embeddings, positions in the batch that could not be encoded)
+    """
+    try:
+        return np.asarray(encode_fn(batch), dtype=np.float32), []
+    except Exception:
+        pass
+    # Retry one by one so a single bad text only costs its own row
+    rows = [None] * len(batch)
+    failed = []
+    for i, text in enumerate(batch):
+        try:
+            rows[i] = np.asarray(encode_fn([text]), dtype=np.float32)[0]
+        except Exception as e:
+            print(f"Could not embed text {text[:60]!r}: {e}")
+            failed.append(i)
+    if dim is None:
+        dim = next((row.shape[0] for row in rows if row is not None), None)
+    if dim is None:
+        raise RuntimeError("Every text in the first batch failed to embed")
+    return np.stack([row if row is not None else np.zeros(dim, dtype=np.float32) for row in rows]), failed
+
+def encode_stream(texts: Iterable[str], total: int, batch_size: Optional[int] = None, window_batches: int = 16,
+                  out_path: Optional[str] = None, encode_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+                  model_id: Optional[str] = None) -> Tuple[np.ndarray, List[int]]:
+    """
+    Encode a stream of texts into a preallocated float32 matrix, batch by batch.
+    Texts are read window by window; inside a window they are sorted by length so each batch
+    pads as little as possible, and every batch is written straight into its rows of the output.
+    When out_path is given the matrix is a .npy memmap and progress is checkpointed after every
+    window, so an interrupted run picks up where it stopped when called again with the same arguments.
+    A run only resumes if the texts it already wrote hash the same and the model is the same;
+    otherwise it starts over.
+    Args:
+        texts: Iterable of texts, consumed once
+        total: Number of texts the iterable yields
+        batch_size: Number of texts per encoder call, defaults to the backend's preferred size
+        window_batches: Number of batches read ahead and sorted by length together
+        out_path: Optional .npy file to write the embeddings to
+        encode_fn: Function mapping a list of texts to a 2-D array, defaults to the configured backend
+        model_id: Identifier of the model behind encode_fn, checked before resuming; taken from the
+            embedder when encode_fn is the configured backend or an Embedder's embed method
+    Returns:
+        Tuple of (embeddings of shape (total, D), indices of texts that could not be embedded and were left as zeros)
+    """
+    if encode_fn is None:
+        embedder = get_default_embedder()
+        encode_fn = embedder.embed
+        batch_size = batch_size or embedder.batch_size
+    if model_id is None:
+        model_id = getattr(getattr(encode_fn, "__self__", None), "model_id", None)
+    batch_size = batch_size or 64
+    texts = iter(texts)
+    out = None
+    done = 0
+    failed: List[int] = []
+    # Hash of the texts consumed so far, saved with the progress
+    texts_hash = hashlib.sha256()
+
+    if out_path and os.path.exists(out_path) and os.path.exists(_progress_path(out_path)):
+        with open(_progress_path(out_path), "r") as f:
+            progress = json.load(f)
+        if progress["total"] == total and progress.get("model_id") == model_id:
+            # The texts the interrupted run already wrote must be the same ones
+            skipped = list(islice(texts, progress["done"]))
+            for text in skipped:
+                texts_hash.update(text.encode("utf-8") + b"\0")
+            if texts_hash.hexdigest() == progress.get("texts_hash"):
+                out = np.load(out_path, mmap_mode="r+")
+                done = progress["done"]
+                failed = progress["failed"]
+                print(f"Resuming embedding at {done}/{total}")
+            else:
+                texts = chain(skipped, texts)
+                texts_hash = hashlib.sha256()
+                print("Input texts changed since the interrupted run, embedding from the start")
 
-def preprocess_qa_pairs(qa_pairs: List[Dict]) -> List[Dict]:
+    window_size = batch_size * window_batches
+    while done < total:
+        window = list(islice(texts, window_size))
+        if not window:
+            raise ValueError(f"Expected {total} texts, got {done}")
+        for text in window:
+            texts_hash.update(text.encode("utf-8") + b"\0")
+        order = sorted(range(len(window)), key=lambda i: len(window[i]))
+        for start in range(0, len(order), batch_size):
+            positions = order[start:start + batch_size]
+            vectors, bad = _encode_batch([window[i] for i in positions], encode_fn,
+                                         out.shape[1] if out is not None else None)
+            if out is None:
+                shape = (total, vectors.shape[1])
+                if out_path:
+                    out = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float32, shape=shape)
+                else:
+                    out = np.zeros(shape, dtype=np.float32)
+            rows = np.asarray(positions) + done
+            out[rows] = vectors
+            failed.extend(int(rows[i]) for i in bad)
+        done += len(window)
+        if out_path:
+            out.flush()
+            with open(_progress_path(out_path), "w") as f:
+                json.dump({"total": total, "done": done, "failed": failed, "model_id": model_id,
+                           "texts_hash": texts_hash.hexdigest()}, f)
+
+    if out_path and os.path.exists(_progress_path(out_path)):
+        os.remove(_progress_path(out_path))
+    if out is None:
+        out = np.zeros((0, 0), dtype=np.float32)
+    return out, failed
+
+def embed_qa_pairs(qa_pairs: List[Dict], batch_size: Optional[int] = None) -> List[Dict]:
     """
     Generate embeddings for questions and answers.
     Args:
         qa_pairs: List of preprocessed QA pairs
+        batch_size: Number of texts per encoder call
     Returns:
         List of dicts with embeddings added
     """
-    questions = [pair["question"] for pair in qa_pairs]
-    answers = [pair["answer"] for pair in qa_pairs]
-    
     # Generate embeddings
-    question_embeddings = generate_embeddings(questions)
-    answer_embeddings = generate_embeddings(answers)
-    
+    question_embeddings, _ = encode_stream((pair["question"] for pair in qa_pairs), len(qa_pairs), batch_size)
+    answer_embeddings, _ = encode_stream((pair["answer"] for pair in qa_pairs), len(qa_pairs), batch_size)
+
     # Add embeddings to QA pairs
     for i, pair in enumerate(qa_pairs):
         pair["question_embedding"] = question_embeddings[i]
         pair["answer_embedding"] = answer_embeddings[i]
-    
+
     return qa_pairs
 
+# Older callers use this name
+preprocess_qa_pairs = embed_qa_pairs
+
 # Example usage
 if __name__ == "__main__":
     import preprocess  # Added missing import statement
-    
+
     try:
         with open("qa_pairs.json" , "r") as f:
             qa_pairs = json.load(f)
-    
+
     except FileNotFoundError:
         print("File not found.")
         exit()
-    
+
     processed_qa_pairs = preprocess.preprocess_qa_pairs(qa_pairs)  # Modified variable name
-    embedded_data = generate_embeddings([pair["question"] for pair in processed_qa_pairs] + [pair["answer"] for pair in processed_qa_pairs])
-    
+    texts = [pair["question"] for pair in processed_qa_pairs] + [pair["answer"] for pair in processed_qa_pairs]
+    embedded_data, _ = encode_stream(texts, len(texts))
+
     for pair in embedded_data:
         print(f"Question: {pair}")
         print(f"Question Embedding Shape: {pair.shape}\n")
         break
-```
\ No newline at end of file
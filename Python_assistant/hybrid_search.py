@@ -0,0 +1,132 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+from bm25_index import BM25Index
+from embeddings import get_embeddings
+from preprocess import preprocess_text
+from similarity_search import SimilarityIndex
+
+# Rank offset of reciprocal-rank fusion; 60 is the value from the original paper
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, np.ndarray], rrf_k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Fuse several rankings of the same documents.
+    Args:
+        rankings: Signal name -> document indices, best first
+        rrf_k: Rank offset; larger values flatten the contribution of the top ranks
+    Returns:
+        List of (document index, fused score), best first
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings.values():
+        for rank, doc in enumerate(ranking.tolist(), start=1):
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+class HybridIndex:
+    """
+    Lexical BM25 and dense cosine retrieval over the same records, fused with reciprocal-rank fusion.
+    Both signals run at the same time: the dense side (query embedding and matrix scan, which
+    release the GIL in NumPy and the encoder) on a worker thread, BM25 on the calling thread.
+    """
+
+    def __init__(self, records: Sequence[Dict], dense: SimilarityIndex, bm25: Optional[BM25Index] = None,
+                 candidates: int = 50, rrf_k: int = RRF_K):
+        """
+        Args:
+            records: One preprocessed QA record per row, with 'question', 'original_question' and 'original_answer'
+            dense: SimilarityIndex over the same rows (exact, quantized or ANN)
+            bm25: BM25Index over the same rows, built from the preprocessed questions if not given
+            candidates: Results taken from each signal before fusion
+            rrf_k: Rank offset of the fusion
+        """
+        self.records = records
+        self.dense = dense
+        self.bm25 = bm25 if bm25 is not None else BM25Index.build([record["question"] for record in records])
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hybrid-dense")
+
+    @classmethod
+    def from_store(cls, store, name: str = "question", **kwargs) -> "HybridIndex":
+        """Build over an embedding_store.EmbeddingStore; the dense side reads its memory-mapped matrix."""
+        return cls(store.records, SimilarityIndex.from_store(store, name), **kwargs)
+
+    @classmethod
+    def from_qa_pairs(cls, qa_pairs: List[Dict], **kwargs) -> "HybridIndex":
+        """Build from preprocessed QA pairs carrying a 'question_embedding'."""
+        return cls(qa_pairs, SimilarityIndex.from_qa_pairs(qa_pairs), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.dense)
+
+    def search_processed(self, processed_query: str, query_vec: Optional[np.ndarray] = None,
+                         k: int = 5) -> List[Dict]:
+        """
+        Hybrid top-k for a query that is already preprocessed.
+        Args:
+            processed_query: Query after preprocess_text
+            query_vec: Query embedding; computed from processed_query if not given
+            k: Number of results
+        Returns:
+            Up to k dicts with question, answer, the fused score, and bm25_score/bm25_rank and
+            dense_score/dense_rank (None when the document was not in that signal's candidates)
+        """
+        def dense_search():
+            vec = get_embeddings([processed_query])[0] if query_vec is None else query_vec
+            return self.dense.search_vector(vec, self.candidates)
+
+        dense_future = self._executor.submit(dense_search)
+        bm25_indices, bm25_scores = self.bm25.search(processed_query, self.candidates)
+        dense_indices, dense_scores = dense_future.result()
+
+        signals = {
+            "bm25": dict(zip(bm25_indices.tolist(), bm25_scores.tolist())),
+            "dense": dict(zip(np.asarray(dense_indices).tolist(), np.asarray(dense_scores).tolist())),
+        }
+        ranks = {name: {doc: rank for rank, doc in enumerate(scores, start=1)} for name, scores in signals.items()}
+        fused = reciprocal_rank_fusion({"bm25": bm25_indices, "dense": np.asarray(dense_indices)}, self.rrf_k)
+
+        results = []
+        for doc, score in fused[:k]:
+            record = self.records[doc]
+            result = {"index": doc, "question": record["original_question"],
+                      "answer": record["original_answer"], "score": score}
+            for name in signals:
+                result[f"{name}_score"] = signals[name].get(doc)
+                result[f"{name}_rank"] = ranks[name].get(doc)
+            results.append(result)
+        return results
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        """
+        Hybrid top-k for a raw user query.
+        Args:
+            query: User input query
+            k: Number of results
+        Returns:
+            See search_processed
+        """
+        return self.search_processed(preprocess_text(query), k=k)
+
+# Example usage
+if __name__ == "__main__":
+    import json
+    from embedding_store import corpus_hash, load_store
+    from embeddings import get_default_embedder
+    from main import build_store
+
+    with open("qa_pairs.json", "r", encoding="utf-8") as f:
+        qa_pairs = json.load(f)
+    model_id = get_default_embedder().model_id
+    corpus = corpus_hash(qa_pairs)
+    try:
+        store = load_store("qa_embeddings", model_id, corpus)
+    except FileNotFoundError:
+        store = build_store(qa_pairs, "qa_embeddings", model_id, corpus)
+    index = HybridIndex.from_store(store)
+
+    for result in index.search("What is ARC-69 used for?", k=3):
+        print(f"{result['score']:.4f}  bm25 #{result['bm25_rank']}  dense #{result['dense_rank']}  {result['question']}")
@@ -0,0 +1,303 @@
+import json
+import os
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from bm25_index import bm25_weights, length_norm, term_statistics, term_weight, tokenize
+from embedding_store import corpus_hash
+from preprocess import preprocess_text
+from preprocess_cache import cached_preprocess_texts, preprocess_fingerprint
+from tf_idf import load_qa_pairs
+from top_k import top_k_indices
+
+INDEX_DIR = "inverted_index"
+FORMAT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+POSTINGS_FILE = "postings.bin"
+TF_FILE = "tf.npy"
+TERMS_FILE = "terms.npz"
+BLOCKS_FILE = "block_last.npy"
+DOC_LENGTHS_FILE = "doc_lengths.npy"
+VOCABULARY_FILE = "vocabulary.json"
+RECORDS_FILE = "records.jsonl"
+
+# Postings per block; queries skip the blocks that hold none of their remaining candidates
+BLOCK_SIZE = 128
+
+
+def _gap_dtype(max_gap: int) -> np.dtype:
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_gap <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise ValueError(f"Document gap {max_gap} does not fit in 32 bits")
+
+class InvertedIndex:
+    """
+    BM25 search over compressed postings, without an external search service.
+    Each term's postings are sorted document ids stored as gaps, in the narrowest unsigned
+    integer type that fits the list; the last document of every BLOCK_SIZE postings is kept
+    as a skip pointer, so any block can be decoded without the ones before it.
+    Term frequencies are kept as uint16 (capped at 65535, far beyond any question), so scores
+    match BM25Index on the same texts. Queries use max-score pruning: once the k-th best score
+    beats everything the remaining terms could add, those terms only touch the blocks holding
+    documents that can still make the top k.
+    """
+
+    def __init__(self, postings: np.ndarray, tf: np.ndarray, terms: Dict[str, np.ndarray], block_last: np.ndarray,
+                 doc_lengths: np.ndarray, vocabulary: Dict[str, int], records: List[Dict],
+                 k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            postings: uint8 buffer of all gap blocks, possibly memory-mapped
+            tf: uint16 term frequency per posting, in postings order
+            terms: Per-term arrays: byte_offset, width, start (first posting), count, first_block, idf, max_score
+            block_last: Last document id of every block
+            doc_lengths: Token count per document
+            vocabulary: Term -> term id
+            records: Stored fields per document
+            k1: Term-frequency saturation
+            b: Document-length normalization
+        """
+        self.postings = postings
+        self.tf = tf
+        self.terms = terms
+        self.block_last = block_last
+        self.doc_lengths = doc_lengths
+        self.vocabulary = vocabulary
+        self.records = records
+        self.k1 = k1
+        self.b = b
+        # BM25 length normalization per document, computed once
+        self._norm = length_norm(doc_lengths, k1, b)
+
+    @classmethod
+    def build(cls, texts: Sequence[str], records: List[Dict], k1: float = 1.2, b: float = 0.75) -> "InvertedIndex":
+        """
+        Index already-preprocessed texts.
+        Args:
+            texts: One text per document, e.g. preprocessed questions
+            records: Stored fields per document, returned with the hits
+            k1: Term-frequency saturation
+            b: Document-length normalization
+        Returns:
+            InvertedIndex
+        """
+        vocabulary, term_ids, doc_ids, tf, doc_lengths = term_statistics(texts)
+        # Postings grouped by term, documents ascending within a term
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids, doc_ids = term_ids[order], doc_ids[order]
+        tf = np.minimum(tf[order], np.iinfo(np.uint16).max).astype(np.uint16)
+
+        n_terms = len(vocabulary)
+        count = np.bincount(term_ids, minlength=n_terms)
+        start = np.zeros(n_terms, dtype=np.int64)
+        np.cumsum(count[:-1], out=start[1:])
+        idf, weights = bm25_weights(term_ids, doc_ids, tf, doc_lengths, n_terms, k1, b)
+        max_score = np.zeros(n_terms, dtype=np.float32)
+        np.maximum.at(max_score, term_ids, weights)
+
+        chunks, block_last = [], []
+        byte_offset = np.zeros(n_terms, dtype=np.int64)
+        width = np.zeros(n_terms, dtype=np.int64)
+        first_block = np.zeros(n_terms, dtype=np.int64)
+        position = 0
+        for term in range(n_terms):
+            docs = doc_ids[start[term]:start[term] + count[term]]
+            gaps = np.diff(docs, prepend=-1)
+            dtype = _gap_dtype(int(gaps.max()))
+            byte_offset[term], width[term], first_block[term] = position, dtype.itemsize, len(block_last)
+            chunks.append(gaps.astype(dtype).tobytes())
+            position += len(chunks[-1])
+            block_last.extend(docs[BLOCK_SIZE - 1::BLOCK_SIZE].tolist())
+            if len(docs) % BLOCK_SIZE:
+                block_last.append(int(docs[-1]))
+
+        terms = {"byte_offset": byte_offset, "width": width, "start": start, "count": count,
+                 "first_block": first_block, "idf": idf, "max_score": max_score}
+        postings = np.frombuffer(b"".join(chunks), dtype=np.uint8)
+        return cls(postings, tf, terms, np.array(block_last, dtype=np.int64), doc_lengths, vocabulary, records, k1, b)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the postings: gap blocks plus term frequencies."""
+        return self.postings.nbytes + self.tf.nbytes
+
+    def _gaps(self, term: int) -> np.ndarray:
+        t = self.terms
+        width = int(t["width"][term])
+        return np.frombuffer(self.postings, dtype=f"u{width}", count=int(t["count"][term]),
+                             offset=int(t["byte_offset"][term]))
+
+    def _decode_all(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Documents and BM25 weights of a term's whole list."""
+        docs = np.cumsum(self._gaps(term), dtype=np.int64)
+        docs -= 1
+        start = int(self.terms["start"][term])
+        return docs, self._weights(term, docs, self.tf[start:start + len(docs)])
+
+    def _decode_blocks(self, term: int, blocks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Documents and BM25 weights of the given (sorted, unique) blocks of a term's list."""
+        count = int(self.terms["count"][term])
+        positions = (blocks[:, None] * BLOCK_SIZE + np.arange(BLOCK_SIZE)).ravel()
+        positions = positions[positions < count]
+        gaps = self._gaps(term)[positions].astype(np.int64)
+        running = np.cumsum(gaps)
+        # Each block decodes from its skip pointer, the last document of the block before it
+        first_block = int(self.terms["first_block"][term])
+        bases = np.where(blocks > 0, self.block_last[first_block + blocks - 1], -1)
+        sizes = np.minimum(count - blocks * BLOCK_SIZE, BLOCK_SIZE)
+        starts = np.cumsum(sizes) - sizes
+        docs = running + np.repeat(bases - running[starts] + gaps[starts], sizes)
+        start = int(self.terms["start"][term])
+        return docs, self._weights(term, docs, self.tf[start + positions])
+
+    def _weights(self, term: int, docs: np.ndarray, tf: np.ndarray) -> np.ndarray:
+        return term_weight(self.terms["idf"][term], tf, self._norm[docs], self.k1)
+
+    def search_tokens(self, tokens: List[str], k: int = 10, prune: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k documents for query tokens.
+        Args:
+            tokens: Query tokens, preprocessed like the indexed texts
+            k: Number of results
+            prune: Use max-score pruning; False scores every posting (same results, for checking)
+        Returns:
+            Tuple of (document ids, BM25 scores), best first
+        """
+        query: Dict[int, int] = {}
+        for token in tokens:
+            term = self.vocabulary.get(token)
+            if term is not None:
+                query[term] = query.get(term, 0) + 1
+        if not query:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Highest-impact terms first, so the threshold rises early
+        order = sorted(query, key=lambda term: -query[term] * self.terms["max_score"][term])
+        bounds = np.array([query[term] * self.terms["max_score"][term] for term in order], dtype=np.float32)
+        # remaining[i]: the most terms i.. can still add to any document
+        remaining = np.cumsum(bounds[::-1])[::-1]
+        scores = np.zeros(len(self), dtype=np.float32)
+        seen = np.zeros(len(self), dtype=bool)
+        candidates = np.empty(0, dtype=np.int64)
+        threshold = 0.0
+        for i, term in enumerate(order):
+            n_blocks = -(-int(self.terms["count"][term]) // BLOCK_SIZE)
+            if prune and threshold > 0 and remaining[i] <= threshold:
+                # No unseen document can reach the top k any more: only score candidates that still might
+                candidates = candidates[scores[candidates] + remaining[i] > threshold]
+                if len(candidates) == 0:
+                    break
+                first_block = int(self.terms["first_block"][term])
+                last_docs = self.block_last[first_block:first_block + n_blocks]
+                wanted = np.zeros(n_blocks + 1, dtype=bool)
+                wanted[np.searchsorted(last_docs, candidates)] = True
+                docs, weights = self._decode_blocks(term, np.flatnonzero(wanted[:n_blocks]))
+                hit = seen[docs]
+                docs, weights = docs[hit], weights[hit]
+            else:
+                docs, weights = self._decode_all(term)
+                new = docs[~seen[docs]]
+                seen[new] = True
+                candidates = np.concatenate([candidates, new])
+            scores[docs] += query[term] * weights
+            if prune and len(candidates) >= k and i + 1 < len(order):
+                threshold = float(np.partition(scores[candidates], -k)[-k])
+        best = candidates[top_k_indices(scores[candidates], k)]
+        return best, scores[best]
+
+    def search(self, processed_query: str, k: int = 10) -> List[Tuple[Dict, float]]:
+        """
+        Top-k records for an already-preprocessed query.
+        Returns:
+            List of (record, BM25 score), best first
+        """
+        docs, scores = self.search_tokens(tokenize(processed_query), k)
+        return [(self.records[doc], float(score)) for doc, score in zip(docs.tolist(), scores.tolist())]
+
+    def save(self, directory: str, manifest: Optional[Dict] = None):
+        """Write the index files, with the manifest last so a partial index is never loaded."""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, POSTINGS_FILE), "wb") as f:
+            f.write(self.postings.tobytes())
+        np.save(os.path.join(directory, TF_FILE), self.tf)
+        np.savez(os.path.join(directory, TERMS_FILE), **self.terms)
+        np.save(os.path.join(directory, BLOCKS_FILE), self.block_last)
+        np.save(os.path.join(directory, DOC_LENGTHS_FILE), self.doc_lengths)
+        with open(os.path.join(directory, VOCABULARY_FILE), "w", encoding="utf-8") as f:
+            json.dump(sorted(self.vocabulary, key=self.vocabulary.get), f, ensure_ascii=False)
+        with open(os.path.join(directory, RECORDS_FILE), "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in self.records)
+        manifest = dict(manifest or {}, format_version=FORMAT_VERSION, k1=self.k1, b=self.b, count=len(self))
+        with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, directory: str) -> Tuple["InvertedIndex", Dict]:
+        """
+        Open a saved index, memory-mapping the postings.
+        Returns:
+            Tuple of (index, manifest)
+        Raises:
+            FileNotFoundError: If there is no index in directory
+        """
+        path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No inverted index in {directory}")
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise FileNotFoundError(f"Inverted index in {directory} has an old format")
+        postings = np.memmap(os.path.join(directory, POSTINGS_FILE), dtype=np.uint8, mode="r") \
+            if os.path.getsize(os.path.join(directory, POSTINGS_FILE)) else np.zeros(0, dtype=np.uint8)
+        with np.load(os.path.join(directory, TERMS_FILE)) as data:
+            terms = {name: data[name] for name in data.files}
+        with open(os.path.join(directory, VOCABULARY_FILE), "r", encoding="utf-8") as f:
+            vocabulary = {term: i for i, term in enumerate(json.load(f))}
+        with open(os.path.join(directory, RECORDS_FILE), "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        index = cls(postings, np.load(os.path.join(directory, TF_FILE), mmap_mode="r"), terms,
+                    np.load(os.path.join(directory, BLOCKS_FILE)), np.load(os.path.join(directory, DOC_LENGTHS_FILE)),
+                    vocabulary, records, manifest["k1"], manifest["b"])
+        return index, manifest
+
+def setup_inverted_index(qa_pairs: List[Dict], index_dir: Optional[str] = INDEX_DIR) -> InvertedIndex:
+    """
+    Open the saved index for these QA pairs, building it when missing or stale.
+    Drop-in replacement for elastic_search.setup_elasticsearch_index that needs no running service.
+    Args:
+        qa_pairs: List of QA pairs
+        index_dir: Directory of the saved index; None builds in memory only
+    Returns:
+        InvertedIndex
+    """
+    corpus = corpus_hash(qa_pairs)
+    fingerprint = preprocess_fingerprint()
+    if index_dir:
+        try:
+            index, manifest = InvertedIndex.load(index_dir)
+            if manifest.get("corpus_hash") == corpus and manifest.get("preprocess") == fingerprint:
+                return index
+        except FileNotFoundError:
+            pass
+    questions = cached_preprocess_texts(pair["question"] for pair in qa_pairs)
+    records = [{"question": question, "original_question": pair["question"], "answer": pair["answer"]}
+               for pair, question in zip(qa_pairs, questions)]
+    index = InvertedIndex.build(questions, records)
+    if index_dir:
+        index.save(index_dir, {"corpus_hash": corpus, "preprocess": fingerprint})
+    return index
+
+def inverted_index_search(query: str, index: InvertedIndex) -> Optional[Tuple[str, float]]:
+    """Best answer and its BM25 score, or None when no question shares a term with the query."""
+    hits = index.search(preprocess_text(query), k=1)
+    if not hits:
+        return None
+    record, score = hits[0]
+    return record["answer"], score
+
+if __name__ == "__main__":
+    index = setup_inverted_index(load_qa_pairs("qa_pairs.json"))
+    print(inverted_index_search("What is Algorand?", index))
@@ -1,40 +1,48 @@
-```python
 import json
-import pickle
-from typing import List, Dict
+from typing import List, Dict, Optional
 from preprocess import preprocess_qa_pairs
-from embeddings import embed_qa_pairs
-from similarity_search import find_best_match
+from preprocess_cache import get_default_cache
+from embeddings import embed_qa_pairs, get_default_embedder
+from embedding_store import EmbeddingStore, corpus_hash, load_store, save_store, source_signature, update_source
+from similarity_search import SimilarityIndex
 
 def load_qa_pairs(file_path: str) -> List[Dict]:
     """Load QA pairs from JSON file."""
-    with open(file_path, 'r') as f:
+    with open(file_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def save_embeddings(qa_pairs: List[Dict], file_path: str):
-    """Save embedded QA pairs to file."""
-    with open(file_path, 'wb') as f:
-        pickle.dump(qa_pairs, f)
-
-def load_embeddings(file_path: str) -> List[Dict]:
-    """Load embedded QA pairs from file."""
-    with open(file_path, 'rb') as f:
-        return pickle.load(f)
+def build_store(qa_pairs: List[Dict], store_dir: str, model_id: str, corpus: str,
+                source: Optional[Dict] = None) -> EmbeddingStore:
+    """Preprocess and embed the QA pairs, then write them as a memory-mapped store."""
+    preprocessed_data = preprocess_qa_pairs(qa_pairs, cache=get_default_cache())
+    embedded_data = embed_qa_pairs(preprocessed_data)
+    matrices = {
+        "question": [pair.pop("question_embedding") for pair in embedded_data],
+        "answer": [pair.pop("answer_embedding") for pair in embedded_data],
+    }
+    dimension = None if embedded_data else get_default_embedder().dimension
+    save_store(store_dir, matrices, embedded_data, model_id, corpus, source, dimension)
+    return load_store(store_dir)
 
 def main():
-    # Load QA pairs
     qa_file = "qa_pairs.json"
-    qa_pairs = load_qa_pairs(qa_file)
-    
-    # Check if embeddings exist, else compute
-    embeddings_file = "qa_embeddings.pkl"
+    store_dir = "qa_embeddings"
+    model_id = get_default_embedder().model_id
+    source = source_signature(qa_file)
     try:
-        embedded_data = load_embeddings(embeddings_file)
+        # Unchanged qa_pairs.json: the manifest alone validates the store
+        store = load_store(store_dir, model_id, source=source)
     except FileNotFoundError:
-        preprocessed_data = preprocess_qa_pairs(qa_pairs)
-        embedded_data = embed_qa_pairs(preprocessed_data, word2vec_path="word2vec.model")
-        save_embeddings(embedded_data, embeddings_file)
-    
+        # The file was touched or edited: compare the corpus hash, rebuild only if the content changed
+        qa_pairs = load_qa_pairs(qa_file)
+        corpus = corpus_hash(qa_pairs)
+        try:
+            store = load_store(store_dir, model_id, corpus)
+            update_source(store, source)
+        except FileNotFoundError:
+            store = build_store(qa_pairs, store_dir, model_id, corpus, source)
+    index = SimilarityIndex.from_store(store)
+
     # Interactive loop
     print("Enter your query (or 'quit' to exit):")
     while True:
@@ -42,7 +50,7 @@ def main():
         if query.lower() == 'quit':
             break
         
-        question, answer, score = find_best_match(query, embedded_data)
+        question, answer, score = index.search(query)[0]
 
         if score > 0.70:
 
@@ -54,4 +62,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-```
\ No newline at end of file
@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import httpx
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class AsyncOllamaEmbedder:
+    """
+    Bulk embedder for Ollama's /api/embed endpoint.
+    Texts are sent in batches over one pooled keep-alive HTTP client, with at most
+    `concurrency` requests in flight and exponential backoff on transient failures.
+    """
+
+    def __init__(self, model: str = "llama3", base_url: str = DEFAULT_OLLAMA_URL, batch_size: int = 32,
+                 concurrency: int = 4, max_retries: int = 5, backoff: float = 0.5, timeout: float = 120.0,
+                 report_every: float = 5.0):
+        self.model = model
+        self.base_url = base_url
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # Seconds between progress lines; 0 disables them
+        self.report_every = report_every
+        self.stats: Dict[str, float] = {}
+
+    async def _embed_batch(self, client: httpx.AsyncClient, batch: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post("/api/embed", json={"model": self.model, "input": batch})
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    return response.json()["embeddings"]
+                error = httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+            except httpx.TransportError as e:
+                error = e
+            if attempt == self.max_retries:
+                raise error
+            self.stats["retries"] += 1
+            # Exponential backoff with jitter so retries from parallel batches spread out
+            await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed all texts, preserving order.
+        Args:
+            texts: List of texts
+        Returns:
+            float32 array of shape (len(texts), D)
+        """
+        self.stats = {"texts": len(texts), "batches": 0, "retries": 0, "seconds": 0.0, "texts_per_sec": 0.0}
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = [(start, texts[start:start + self.batch_size]) for start in range(0, len(texts), self.batch_size)]
+        out: Optional[np.ndarray] = None
+        done = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        start_time = last_report = time.perf_counter()
+
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=self.timeout) as client:
+            async def run(start: int, batch: List[str]):
+                nonlocal out, done, last_report
+                async with semaphore:
+                    vectors = np.asarray(await self._embed_batch(client, batch), dtype=np.float32)
+                if out is None:
+                    out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                out[start:start + len(batch)] = vectors
+                done += len(batch)
+                self.stats["batches"] += 1
+                now = time.perf_counter()
+                if self.report_every and now - last_report >= self.report_every:
+                    last_report = now
+                    print(f"Embedded {done}/{len(texts)} texts ({done / (now - start_time):.1f} texts/sec)")
+
+            await asyncio.gather(*(run(start, batch) for start, batch in batches))
+
+        self.stats["seconds"] = time.perf_counter() - start_time
+        self.stats["texts_per_sec"] = len(texts) / self.stats["seconds"]
+        return out
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Blocking wrapper around aembed for synchronous callers.
+        Inside a running event loop asyncio.run would raise, so the embedding then runs on its own
+        loop in a worker thread; async callers should await aembed instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aembed(list(texts)))
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, self.aembed(list(texts))).result()
+
+def start_stub_server(latency: float = 0.05, fail_rate: float = 0.0, dimension: int = 64,
+                      port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Serve a stand-in for Ollama's /api/embed in a background thread, for tests and benchmarks.
+    Vectors come from the hashing embedder, so the same text always gets the same vector.
+    Args:
+        latency: Seconds each request takes, imitating model time
+        fail_rate: Share of requests answered with 503, to exercise the retries
+        dimension: Embedding size
+        port: Port to listen on, 0 picks a free one
+    Returns:
+        (server, base_url); call server.shutdown() to stop it
+    """
+    from embedders import HashingEmbedder
+    embedder = HashingEmbedder(dimension)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency)
+            if self.path != "/api/embed":
+                status, payload = 404, {"error": "not found"}
+            elif random.random() < fail_rate:
+                status, payload = 503, {"error": "busy"}
+            else:
+                texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                status, payload = 200, {"model": body["model"], "embeddings": embedder.embed(texts).tolist()}
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-embed the QA questions with Ollama")
+    parser.add_argument("--qa-file", default="qa_pairs.json")
+    parser.add_argument("--base-url", default=DEFAULT_OLLAMA_URL)
+    parser.add_argument("--model", default="llama3")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--stub", action="store_true", help="Serve a local stub of /api/embed instead of calling Ollama")
+    args = parser.parse_args()
+
+    if args.stub:
+        server, args.base_url = start_stub_server()
+        print(f"Stub Ollama at {args.base_url}")
+    with open(args.qa_file, "r", encoding="utf-8") as f:
+        questions = [pair["question"] for pair in json.load(f)]
+    embedder = AsyncOllamaEmbedder(args.model, args.base_url, batch_size=args.batch_size,
+                                   concurrency=args.concurrency, report_every=1.0)
+    vectors = embedder.embed(questions)
+    print(f"Embedded {len(questions)} questions into {vectors.shape}: {embedder.stats}")
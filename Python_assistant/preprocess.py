@@ -1,11 +1,71 @@
-import spacy
+import os
 import re
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, FrozenSet
 import json
 import unicodedata
+from collections import deque
 
-# Load spacy model (English, medium-sized for balance of speed and accuracy)
-nlp = spacy.load("en_core_web_md", disable=["parser", "ner"])  # Disable unused components for speed
+# "full" loads en_core_web_md (tagger-aware lemmas), "fast" a blank English pipeline
+# with a lookup lemmatizer only. Either way the model is loaded on first use, not on import.
+MODEL_MODES = ("full", "fast")
+model_mode = os.environ.get("PREPROCESS_MODE", "full")
+FULL_MODEL = "en_core_web_md"
+# Part of the preprocess cache fingerprint, next to the source of the functions that shape the output
+# (see preprocess_cache.OUTPUT_FUNCTIONS); bump it to drop cached results after any other change
+PREPROCESS_VERSION = 1
+
+_nlp = None
+_stop_words = None
+
+def set_model_mode(mode: str):
+    """
+    Choose which spaCy pipeline is loaded on first use.
+    Args:
+        mode: "full" for en_core_web_md, "fast" for the tokenizer plus lookup lemmatizer
+    """
+    global model_mode, _nlp
+    if mode not in MODEL_MODES:
+        raise ValueError(f"Unknown model mode {mode!r}, expected one of {MODEL_MODES}")
+    if mode != model_mode:
+        model_mode = mode
+        _nlp = None
+
+def get_nlp():
+    """
+    Return the spaCy pipeline, loading it on the first call.
+    Returns:
+        spaCy Language object for the current model mode
+    """
+    global _nlp
+    if _nlp is None:
+        import spacy
+        if model_mode == "fast":
+            # Needs spacy-lookups-data for the English lemma table
+            nlp = spacy.blank("en")
+            nlp.add_pipe("lemmatizer", config={"mode": "lookup"})
+            nlp.initialize()
+        else:
+            # Load spacy model (English, medium-sized for balance of speed and accuracy)
+            nlp = spacy.load(FULL_MODEL, disable=["parser", "ner"])  # Disable unused components for speed
+        _nlp = nlp
+    return _nlp
+
+def get_stop_words() -> FrozenSet[str]:
+    """
+    Return the English stop-word set, built once.
+    Both model modes share spaCy's English defaults, so this never loads a model.
+    """
+    global _stop_words
+    if _stop_words is None:
+        from spacy.lang.en.stop_words import STOP_WORDS
+        _stop_words = frozenset(STOP_WORDS)
+    return _stop_words
+
+# One translation table does the apostrophe fix and drops ASCII control characters
+# (the only "Cc" characters that can survive the ASCII encode) in a single pass
+_CLEAN_TABLE = {ord("’"): "'"}
+_CLEAN_TABLE.update({code: None for code in range(32)})
+_CLEAN_TABLE[127] = None
 
 def clean_utf8_text(text: str) -> str:
     """
@@ -15,13 +75,30 @@ def clean_utf8_text(text: str) -> str:
     Returns:
         Cleaned text with normalized characters
     """
-    # Replace curly apostrophes and quotes with straight ones
-    text = text.replace("’", "'").replace("'", "'").replace("'", "'")
+    # Replace curly apostrophes and remove control characters
+    text = text.translate(_CLEAN_TABLE)
+    # Already ASCII, nothing left to normalize
+    if text.isascii():
+        return text
     # Normalize Unicode to ASCII
-    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
-    # Remove control characters
-    text = "".join(c for c in text if unicodedata.category(c) != "Cc")
-    return text
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+def clean_many(texts: Iterable[str]) -> List[str]:
+    """
+    Clean a corpus of texts with clean_utf8_text.
+    Args:
+        texts: Iterable of input texts
+    Returns:
+        List of cleaned texts, in input order
+    """
+    table = _CLEAN_TABLE
+    normalize = unicodedata.normalize
+    cleaned = []
+    append = cleaned.append
+    for text in texts:
+        text = text.translate(table)
+        append(text if text.isascii() else normalize("NFKD", text).encode("ascii", "ignore").decode("ascii"))
+    return cleaned
 
 def normalize_number(text: str) -> str:
     """
@@ -33,6 +110,28 @@ def normalize_number(text: str) -> str:
     """
     return re.sub(r"(\d+)", lambda m: m.group(1).zfill(len(m.group())), text)
 
+def _make_doc(text: str):
+    """
+    Clean text and split it on whitespace into a spaCy Doc, ready for the pipeline.
+    Args:
+        text: Input text to be processed
+    Returns:
+        Doc with one token per whitespace-separated word
+    """
+    from spacy.tokens import Doc
+    return Doc(get_nlp().vocab, words=clean_utf8_text(text).split())
+
+def _filter_lemmas(doc) -> str:
+    """
+    Join the lemmas of a processed Doc, dropping stop words.
+    Args:
+        doc: Doc that has been run through the pipeline
+    Returns:
+        Space-separated lemmas without stop words
+    """
+    stop_words = get_stop_words()
+    return " ".join(token.lemma_ for token in doc if token.lemma_ not in stop_words)
+
 def preprocess_text(text: str) -> str:
     """
     Preprocess text data for NLP tasks.
@@ -41,34 +140,69 @@ def preprocess_text(text: str) -> str:
     Returns:
         Processed text with normalized characters, lemmatized words, and removed stop words
     """
-    # Normalize Unicode characters
-    text = clean_utf8_text(text)
-    # Tokenize text
-    tokens = nlp.tokenizer.tokens_from_list(text.split())
-    # Lemmatize words
-    lemmatized_tokens = [token.lemma_ for token in tokens]
-    # Remove stop words
-    stop_words = set(nlp.Defaults.stop_words)
-    filtered_lemmas = [lemma for lemma in lemmatized_tokens if lemma not in stop_words]
-    return " ".join(filtered_lemmas)
+    # Normalize Unicode characters and tokenize on whitespace
+    doc = _make_doc(text)
+    # Lemmatize words and remove stop words
+    return _filter_lemmas(get_nlp()(doc))
+
+def preprocess_texts(texts: Iterable[str], batch_size: int = 256, n_process: int = 1) -> Iterator[str]:
+    """
+    Preprocess a stream of texts in batches with nlp.pipe.
+    Args:
+        texts: Iterable of input texts
+        batch_size: Number of texts sent through the pipeline at once
+        n_process: Number of worker processes used by spaCy
+    Returns:
+        Generator of processed texts, in input order
+    """
+    docs = (_make_doc(text) for text in texts)
+    for doc in get_nlp().pipe(docs, batch_size=batch_size, n_process=n_process):
+        yield _filter_lemmas(doc)
 
-def preprocess_qa_pairs(qa_pairs: List[Dict]) -> List[Dict]:
+def iter_preprocessed_qa_pairs(qa_pairs: Iterable[Dict], batch_size: int = 256, n_process: int = 1,
+                               cache=None) -> Iterator[Dict]:
+    """
+    Preprocess QA pairs as a stream, batching questions and answers through one pipeline.
+    Args:
+        qa_pairs: Iterable of dicts with 'question' and 'answer' keys
+        batch_size: Number of texts sent through the pipeline at once
+        n_process: Number of worker processes used by spaCy
+        cache: Optional preprocess_cache.PreprocessCache to reuse earlier results
+    Returns:
+        Generator of dicts with preprocessed 'question' and 'answer'
+    """
+    originals = deque()
+
+    def interleave():
+        for pair in qa_pairs:
+            originals.append(pair)
+            yield pair["question"]
+            yield pair["answer"]
+
+    process = cache.preprocess_texts if cache is not None else preprocess_texts
+    processed = process(interleave(), batch_size=batch_size, n_process=n_process)
+    for question, answer in zip(processed, processed):
+        pair = originals.popleft()
+        yield {
+            "question": question,
+            "answer": answer,
+            "original_question": pair["question"],  # Keep original for display
+            "original_answer": pair["answer"]
+        }
+
+def preprocess_qa_pairs(qa_pairs: List[Dict], batch_size: int = 256, n_process: int = 1,
+                        cache=None) -> List[Dict]:
     """
     Preprocess all questions and answers in the dataset.
     Args:
         qa_pairs: List of dicts with 'question' and 'answer' keys
+        batch_size: Number of texts sent through the pipeline at once
+        n_process: Number of worker processes used by spaCy
+        cache: Optional preprocess_cache.PreprocessCache to reuse earlier results
     Returns:
         List of dicts with preprocessed 'question' and 'answer'
     """
-    preprocessed_pairs = []
-    for pair in qa_pairs:
-        preprocessed_pairs.append({
-            "question": preprocess_text(pair["question"]),
-            "answer": preprocess_text(pair["answer"]),
-            "original_question": pair["question"],  # Keep original for display
-            "original_answer": pair["answer"]
-        })
-    return preprocessed_pairs
+    return list(iter_preprocessed_qa_pairs(qa_pairs, batch_size=batch_size, n_process=n_process, cache=cache))
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+import hashlib
+import inspect
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import spacy
+import preprocess
+
+# Next to this module, so servers started from another directory (e.g. Agent_with_MCP) share it
+DEFAULT_CACHE_PATH = os.environ.get(
+    "PREPROCESS_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "preprocess_cache.sqlite"))
+
+# Functions whose source decides what preprocess_text returns; editing any of them invalidates the cache
+OUTPUT_FUNCTIONS = (
+    preprocess.get_nlp,
+    preprocess.clean_utf8_text,
+    preprocess.clean_many,
+    preprocess._make_doc,
+    preprocess._filter_lemmas,
+    preprocess.preprocess_text,
+    preprocess.preprocess_texts,
+)
+
+
+def _source(function) -> str:
+    try:
+        return inspect.getsource(function)
+    except (OSError, TypeError):
+        # No source available (e.g. a frozen build): PREPROCESS_VERSION still applies
+        return function.__qualname__
+
+def preprocess_fingerprint() -> str:
+    """
+    Fingerprint everything that decides the output of preprocess_text, without loading spaCy.
+    Covers the model mode, the spaCy and model package versions, the source of OUTPUT_FUNCTIONS,
+    the cleaning table, preprocess.PREPROCESS_VERSION and the stop-word list, so cached results
+    are dropped as soon as any of them changes.
+    Returns:
+        Hex digest identifying the current preprocessing setup
+    """
+    # The fast pipeline takes its lemma table from spacy-lookups-data
+    package = preprocess.FULL_MODEL if preprocess.model_mode == "full" else "spacy-lookups-data"
+    h = hashlib.sha256()
+    for part in (
+        spacy.__version__,
+        preprocess.model_mode,
+        package,
+        spacy.util.get_package_version(package) or "",
+        str(preprocess.PREPROCESS_VERSION),
+        *(_source(function) for function in OUTPUT_FUNCTIONS),
+        repr(sorted(preprocess._CLEAN_TABLE.items())),
+        "\n".join(sorted(preprocess.get_stop_words())),
+    ):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class PreprocessCache:
+    """
+    Content-addressed cache of preprocess_text results.
+    An in-process LRU sits in front of an SQLite table, keyed by a hash of the
+    input text and the preprocessing fingerprint.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_memory_items: int = 100_000):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.fingerprint = preprocess_fingerprint()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS preprocessed ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, result TEXT NOT NULL)"
+        )
+        # Anything produced by a different model, cleaner or stop-word list is stale
+        self._db.execute("DELETE FROM preprocessed WHERE fingerprint != ?", (self.fingerprint,))
+        self._db.commit()
+
+    def key(self, text: str) -> str:
+        """Content address of a text under the current fingerprint."""
+        return hashlib.sha256(f"{self.fingerprint}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, result: str):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def lookup(self, keys: List[str]) -> Dict[str, str]:
+        """
+        Fetch cached results, memory first and SQLite for the rest.
+        Args:
+            keys: Content addresses to look up
+        Returns:
+            Mapping of found keys to their preprocessed text
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                else:
+                    missing.append(key)
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, result FROM preprocessed WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, result in rows:
+                    found[key] = result
+                    self._remember(key, result)
+                    self.disk_hits += 1
+        return found
+
+    def store(self, results: Dict[str, str]):
+        """Write freshly computed results to both layers."""
+        with self._lock:
+            for key, result in results.items():
+                self._remember(key, result)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO preprocessed (key, fingerprint, result) VALUES (?, ?, ?)",
+                [(key, self.fingerprint, result) for key, result in results.items()],
+            )
+            self._db.commit()
+
+    def preprocess_texts(self, texts: Iterable[str], batch_size: int = 256, n_process: int = 1) -> Iterator[str]:
+        """
+        Cached drop-in for preprocess.preprocess_texts.
+        Only texts that have never been seen under the current fingerprint are run through spaCy,
+        which is only loaded on the first miss.
+        Args:
+            texts: Iterable of input texts
+            batch_size: Number of texts looked up and processed at once
+            n_process: Number of worker processes used by spaCy for misses
+        Returns:
+            Generator of processed texts, in input order
+        """
+        texts = iter(texts)
+        while True:
+            chunk = list(islice(texts, batch_size))
+            if not chunk:
+                return
+            keys = [self.key(text) for text in chunk]
+            found = self.lookup(keys)
+            todo = {}
+            for key, text in zip(keys, chunk):
+                if key not in found:
+                    todo.setdefault(key, text)
+            self.hits += len(chunk) - len(todo)
+            self.misses += len(todo)
+            if todo:
+                computed = dict(zip(todo, preprocess.preprocess_texts(
+                    todo.values(), batch_size=batch_size, n_process=n_process
+                )))
+                self.store(computed)
+                found.update(computed)
+            for key in keys:
+                yield found[key]
+
+    def preprocess_text(self, text: str) -> str:
+        """Cached drop-in for preprocess.preprocess_text."""
+        return next(self.preprocess_texts([text]))
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters; disk_hits is the part of hits served from SQLite."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_items": len(self._memory),
+        }
+
+    def close(self):
+        self._db.close()
+
+_default_cache: Optional[PreprocessCache] = None
+
+def get_default_cache() -> PreprocessCache:
+    """Return the process-wide cache stored at DEFAULT_CACHE_PATH."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PreprocessCache()
+    return _default_cache
+
+def cached_preprocess_texts(texts: Iterable[str], batch_size: int = 256, n_process: int = 1) -> List[str]:
+    """
+    Preprocess texts through the default on-disk cache.
+    Args:
+        texts: Iterable of input texts
+        batch_size: Number of texts looked up and processed at once
+        n_process: Number of worker processes used by spaCy for misses
+    Returns:
+        List of processed texts, in input order
+    """
+    return list(get_default_cache().preprocess_texts(texts, batch_size=batch_size, n_process=n_process))
+
+if __name__ == "__main__":
+    import json
+
+    with open("qa_pairs.json", "r", encoding="utf-8") as f:
+        qa_pairs = json.load(f)
+
+    cache = get_default_cache()
+    cached_preprocess_texts(pair["question"] for pair in qa_pairs)
+    print(cache.stats())
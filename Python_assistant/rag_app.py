@@ -1,13 +1,19 @@
 import json
-from typing import List, Dict
-from langchain_ollama import OllamaEmbeddings, OllamaLLM
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+from langchain_ollama import OllamaLLM
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 from langchain.chains.retrieval_qa.base import RetrievalQA
 from langchain.prompts import PromptTemplate
 from preprocess import preprocess_text
+from preprocess_cache import cached_preprocess_texts, preprocess_fingerprint
+from embedders import get_embedder
+from embedding_store import _atomic_write, corpus_hash, document_id
 
-
+INDEX_DIR = "faiss_index"
+MANIFEST_FILE = "manifest.json"
 
 def load_qa_pairs(file_path: str) -> List[Dict]:
     """Load QA pairs from JSON file."""
@@ -23,8 +29,8 @@ def prepare_documents(qa_pairs: List[Dict]) -> List[Document]:
         List of Document objects
     """
     documents = []
-    for pair in qa_pairs:
-        cleaned_question = preprocess_text(pair["question"])
+    cleaned_questions = cached_preprocess_texts(pair["question"] for pair in qa_pairs)
+    for pair, cleaned_question in zip(qa_pairs, cleaned_questions):
         doc = Document(
             page_content=cleaned_question,
             metadata={
@@ -35,68 +41,158 @@ def prepare_documents(qa_pairs: List[Dict]) -> List[Document]:
         documents.append(doc)
     return documents
 
-def create_vector_store(documents: List[Document]) -> FAISS:
+def embed_documents(embedder, documents: List[Document]) -> List[tuple]:
+    """
+    Embed documents in bulk with the backend's own batching, for FAISS.from_embeddings.
+    Args:
+        embedder: Embedder from get_embedder
+        documents: List of Document objects
+    Returns:
+        List of (text, vector) pairs
+    """
+    texts = [doc.page_content for doc in documents]
+    vectors = embedder.embed(texts)
+    return list(zip(texts, vectors.tolist()))
+
+def create_vector_store(documents: List[Document], ids: Optional[List[str]] = None) -> FAISS:
     """
-    Create FAISS vector store with Ollama embeddings.
+    Create FAISS vector store with Ollama embeddings, or the backend named by $EMBEDDER.
     Args:
         documents: List of Document objects
+        ids: Optional document ids, see document_id
     Returns:
         FAISS vector store
     """
-    embeddings = OllamaEmbeddings(model="llama3")
-    vector_store = FAISS.from_documents(documents, embeddings)
+    embedder = get_embedder(default="ollama")
+    vector_store = FAISS.from_embeddings(embed_documents(embedder, documents), embedder.as_langchain(),
+                                         metadatas=[doc.metadata for doc in documents], ids=ids)
     return vector_store
 
-def setup_rag_chain(vector_store: FAISS) -> RetrievalQA:
+def load_manifest(index_dir: str) -> Optional[Dict]:
+    """Read the manifest saved next to a FAISS index, if any."""
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path) or not os.path.exists(os.path.join(index_dir, "index.faiss")):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_or_update_vector_store(qa_pairs: List[Dict], index_dir: str = INDEX_DIR) -> FAISS:
     """
-    Set up RAG chain with LLaMA3 LLM and custom prompt.
+    Load the saved FAISS index, bringing it up to date with the QA pairs.
+    The manifest records the embedding model, the preprocessing fingerprint, the corpus hash
+    and the id of every indexed pair. An unchanged corpus is loaded as is; otherwise only
+    new or edited pairs are embedded and added, and deleted ones removed. A different
+    embedding model or preprocessing setup forces a full rebuild.
     Args:
-        vector_store: FAISS vector store
+        qa_pairs: List of QA pairs
+        index_dir: Directory of the saved index
     Returns:
-        RetrievalQA chain
+        FAISS vector store
     """
-    llm = OllamaLLM(model="llama3")
-    
-    # Custom prompt using 'context' for retrieved documents
-    prompt_template = """You are an expert on the Algorand blockchain. Given the following question and the context from the dataset, provide a concise and accurate response based on the provided context. Do not add external information.
+    embedder = get_embedder(default="ollama")
+    # Duplicate pairs share an id; keep the first
+    wanted = {}
+    for pair in qa_pairs:
+        wanted.setdefault(document_id(pair), pair)
+    corpus = corpus_hash(qa_pairs)
+    fingerprint = preprocess_fingerprint()
+
+    manifest = load_manifest(index_dir)
+    if manifest and manifest["embedding_model"] == embedder.model_id and manifest["preprocess"] == fingerprint:
+        vector_store = FAISS.load_local(index_dir, embedder.as_langchain(), allow_dangerous_deserialization=True)
+        if manifest["corpus_hash"] == corpus:
+            return vector_store
+        indexed = set(manifest["ids"])
+        removed = [doc_id for doc_id in manifest["ids"] if doc_id not in wanted]
+        added = [doc_id for doc_id in wanted if doc_id not in indexed]
+        if removed:
+            vector_store.delete(removed)
+        if added:
+            documents = prepare_documents([wanted[doc_id] for doc_id in added])
+            vector_store.add_embeddings(embed_documents(embedder, documents),
+                                        metadatas=[doc.metadata for doc in documents], ids=added)
+        print(f"Updated vector store: {len(added)} added, {len(removed)} removed")
+    else:
+        ids = list(wanted)
+        vector_store = create_vector_store(prepare_documents(list(wanted.values())), ids)
+        print(f"Built vector store with {len(ids)} documents")
+
+    # Without a manifest a half-saved index is rebuilt, instead of having its new ids added again
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    vector_store.save_local(index_dir)
+    manifest = {
+        "embedding_model": embedder.model_id,
+        "preprocess": fingerprint,
+        "corpus_hash": corpus,
+        "ids": list(wanted),
+    }
+    _atomic_write(manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+    return vector_store
+
+# Custom prompt using 'context' for retrieved documents
+RAG_PROMPT = PromptTemplate(
+    input_variables=["question", "context"],
+    template="""You are an expert on the Algorand blockchain. Given the following question and the context from the dataset, provide a concise and accurate response based on the provided context. Do not add external information.
 
     Question: {question}
     Context: {context}
 
     Response: """
-    
-    prompt = PromptTemplate(
-        input_variables=["question", "context"],
-        template=prompt_template
-    )
+)
+
+def setup_rag_chain(vector_store: FAISS) -> RetrievalQA:
+    """
+    Set up RAG chain with LLaMA3 LLM and custom prompt.
+    Args:
+        vector_store: FAISS vector store
+    Returns:
+        RetrievalQA chain
+    """
+    llm = OllamaLLM(model="llama3")
     
     # Set up RetrievalQA chain
     qa_chain = RetrievalQA.from_chain_type(
         llm=llm,
         chain_type="stuff",
         retriever=vector_store.as_retriever(search_kwargs={"k": 1}),
-        chain_type_kwargs={"prompt": prompt},
+        chain_type_kwargs={"prompt": RAG_PROMPT},
         return_source_documents=True
     )
     
     return qa_chain
 
+def stream_rag_answer(llm, query: str, documents: List[Document], metrics: Optional[Dict] = None) -> Iterator[str]:
+    """
+    Yield the RAG answer token by token, with the same prompt and context as setup_rag_chain.
+    Args:
+        llm: LLM to stream from, e.g. OllamaLLM
+        query: Cleaned query
+        documents: Retrieved documents, e.g. vector_store.similarity_search(query, k=1)
+        metrics: Optional dict filled with first_token_ms and total_ms
+    Returns:
+        Iterator of text chunks
+    """
+    # Same layout as the "stuff" chain: page contents separated by blank lines
+    context = "\n\n".join(doc.page_content for doc in documents)
+    start = time.perf_counter()
+    for chunk in (RAG_PROMPT | llm).stream({"question": query, "context": context}):
+        if metrics is not None and "first_token_ms" not in metrics:
+            metrics["first_token_ms"] = (time.perf_counter() - start) * 1000
+        yield chunk
+    if metrics is not None:
+        metrics["total_ms"] = (time.perf_counter() - start) * 1000
+
 def main():
     # Load QA pairs
     qa_file = "qa_pairs.json"
     qa_pairs = load_qa_pairs(qa_file)
     
-    # Prepare documents
-    documents = prepare_documents(qa_pairs)
-    
-    # Create vector store
-    vector_store = create_vector_store(documents)
-    
-    # Save vector store for reuse
-    vector_store.save_local("faiss_index")
-    
-    # Set up RAG chain
-    qa_chain = setup_rag_chain(vector_store)
+    # Load the saved vector store, embedding only new or changed pairs
+    vector_store = load_or_update_vector_store(qa_pairs)
+
+    llm = OllamaLLM(model="llama3")
     
     # Interactive query loop
     print("Enter your query (or 'quit' to exit):")
@@ -108,16 +204,16 @@ def main():
         # Clean query
         cleaned_query = preprocess_text(query)
         
-        # Run RAG chain
-        result = qa_chain.invoke({"query": cleaned_query})
-        
-        # Extract answer and source
-        answer = result["result"]
-        source = result["source_documents"][0].metadata
-        
+        # Retrieve the closest pair, then stream the answer as it is generated
+        documents = vector_store.similarity_search(cleaned_query, k=1)
+        source = documents[0].metadata
         print(f"\nMatched Question: {source['original_question']}")
-        print(f"Answer: {answer}")
-        print(f"Dataset Answer: {source['answer']}\n")
+        print("Answer: ", end="", flush=True)
+        metrics = {}
+        for token in stream_rag_answer(llm, cleaned_query, documents, metrics):
+            print(token, end="", flush=True)
+        print(f"\nDataset Answer: {source['answer']}")
+        print(f"(first token {metrics.get('first_token_ms', 0):.0f} ms, total {metrics.get('total_ms', 0):.0f} ms)\n")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,9 +1,14 @@
 import numpy as np
-from typing import List, Dict, Tuple
-from preprocess import preprocess_text
-from embeddings import get_embeddings
+from typing import List, Dict, Tuple, Sequence, Union
+from preprocess import preprocess_text, preprocess_texts
+from embeddings import get_embeddings, encode_stream
+from quantization import QuantizedMatrix, row_norms
+from top_k import top_k_indices, top_k_rows
 import json
 
+# Upper bound on the size of one block of the query x corpus score matrix
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
 def cosine_similarity_matrix(query_vec: np.ndarray, doc_matrix: np.ndarray) -> np.ndarray:
     """
     Compute cosine similarity between a single query vector and a matrix of document vectors.
@@ -18,31 +23,257 @@ def cosine_similarity_matrix(query_vec: np.ndarray, doc_matrix: np.ndarray) -> n
     dot_products = np.dot(doc_matrix, query_vec)
     return dot_products / (doc_norms * query_norm + 1e-10)  # Add epsilon to avoid division by zero
 
+def quantize_normalized(matrix: np.ndarray, kind: str) -> QuantizedMatrix:
+    """
+    Quantize the L2-normalized rows of a matrix, the form SimilarityIndex scores against.
+    Args:
+        matrix: Embeddings of shape (N, D), possibly memory-mapped
+        kind: "int8" or "float16"
+    Returns:
+        QuantizedMatrix, which can be saved and passed back to SimilarityIndex later
+    """
+    return QuantizedMatrix.from_matrix(matrix, kind, row_scale=1.0 / np.maximum(row_norms(matrix), 1e-10))
+
+class SimilarityIndex:
+    """
+    Cosine-similarity index over a fixed matrix of embeddings.
+    Rows are L2-normalized once as float32, so a query is one matrix-vector product plus a top-k selection.
+    With quantization, candidates are scored on an int8/float16 copy and the best ones re-ranked
+    exactly against the float32 rows, which can then stay memory-mapped on disk.
+    With an ANN index (ann_index.IVFIndex or HNSWIndex), only the candidates it returns are scored.
+    """
+
+    def __init__(self, matrix: np.ndarray, records: Sequence[Dict],
+                 quantization: Union[None, str, QuantizedMatrix] = None, rerank: int = 32, ann=None):
+        """
+        Args:
+            matrix: Embeddings of shape (N, D), e.g. a memory-mapped store matrix
+            records: One QA record per row, with 'original_question' and 'original_answer'
+            quantization: None for exact float32 scoring, "int8"/"float16" to quantize the matrix here,
+                or a QuantizedMatrix of the L2-normalized rows built earlier (see quantize_normalized)
+            rerank: Candidates per query re-scored in float32 when quantized or using an ANN index
+            ann: Optional approximate nearest-neighbour index built over this matrix
+        Raises:
+            ValueError: If both quantization and ann are given; ANN candidates are scored in float32
+        """
+        if ann is not None and quantization is not None:
+            raise ValueError("quantization and ann cannot be combined")
+        matrix = np.asarray(matrix)
+        self.records = records
+        self.rerank = rerank
+        self.quantized = None
+        self.ann = ann
+        if ann is not None:
+            # Candidates come from the ANN index and are scored straight from the float32 rows
+            self.matrix = matrix
+            return
+        if quantization is not None:
+            # Leave the float32 rows where they are; only the quantized copy has to be resident
+            self.matrix = matrix
+            if isinstance(quantization, QuantizedMatrix):
+                self.quantized = quantization
+            else:
+                self.quantized = quantize_normalized(matrix, quantization)
+            return
+        norms = row_norms(matrix)
+        if matrix.dtype == np.float32 and np.allclose(norms, 1.0, atol=1e-3):
+            # Already unit length (e.g. Universal Sentence Encoder): keep the mapped pages shared
+            self.matrix = matrix
+        else:
+            self.matrix = (matrix / np.maximum(norms, 1e-10)[:, None]).astype(np.float32)
+
+    @classmethod
+    def from_qa_pairs(cls, qa_pairs: List[Dict], **kwargs) -> "SimilarityIndex":
+        """Build an index from QA pairs carrying a 'question_embedding'."""
+        return cls(np.array([pair["question_embedding"] for pair in qa_pairs]), qa_pairs, **kwargs)
+
+    @classmethod
+    def from_store(cls, store, name: str = "question", **kwargs) -> "SimilarityIndex":
+        """Build an index over one matrix of an embedding_store.EmbeddingStore."""
+        return cls(store.matrices[name], store.records, **kwargs)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes the index needs in memory for scoring, not counting re-ranked rows read on demand."""
+        if self.ann is not None:
+            return 0
+        if self.quantized is not None:
+            return self.quantized.nbytes
+        return self.matrix.nbytes
+
+    def _score_block(self, queries: np.ndarray, start: int, stop: int) -> np.ndarray:
+        if self.quantized is not None:
+            return self.quantized.dot(queries, start, stop)
+        return queries @ self.matrix[start:stop].T
+
+    def _rerank(self, queries: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact float32 scores for each query's candidates, keeping the best k."""
+        rows = np.asarray(self.matrix[candidates.ravel()], dtype=np.float32)
+        rows = rows.reshape(candidates.shape + (rows.shape[-1],))
+        exact = np.einsum("qcd,qd->qc", rows, queries) / np.maximum(np.linalg.norm(rows, axis=2), 1e-10)
+        columns, scores = top_k_rows(exact, k)
+        return np.take_along_axis(candidates, columns, axis=1), scores
+
+    def search_vector(self, query_vec: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the rows most similar to a query embedding.
+        Args:
+            query_vec: Query vector of shape (D,)
+            k: Number of results
+        Returns:
+            Tuple of (row indices, cosine similarity scores), best first
+        """
+        if self.quantized is not None:
+            indices, scores = self.search_vectors(np.asarray(query_vec)[None, :], k)
+            return indices[0], scores[0]
+        query_vec = np.asarray(query_vec, dtype=np.float32)
+        query_vec = query_vec / (np.linalg.norm(query_vec) + 1e-10)
+        if self.ann is not None:
+            # Sorted ids read a memory-mapped matrix front to back
+            candidates = np.sort(self.ann.candidates(query_vec, max(k, self.rerank)))
+            rows = np.asarray(self.matrix[candidates], dtype=np.float32)
+            scores = rows @ query_vec / np.maximum(np.linalg.norm(rows, axis=1), 1e-10)
+            best = top_k_indices(scores, k)
+            return candidates[best], scores[best]
+        scores = self.matrix @ query_vec
+        indices = top_k_indices(scores, k)
+        return indices, scores[indices]
+
+    def search_vectors(self, query_matrix: np.ndarray, k: int = 1,
+                       memory_budget: int = DEFAULT_MEMORY_BUDGET) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the rows most similar to each of many query embeddings.
+        Scores are computed one (query block x corpus block) GEMM at a time so that no score
+        block exceeds memory_budget bytes, keeping a running top-k per query across corpus blocks.
+        Args:
+            query_matrix: Query vectors of shape (Q, D)
+            k: Number of results per query
+            memory_budget: Maximum bytes for one block of float32 scores
+        Returns:
+            Tuple of (row indices, cosine similarity scores), both of shape (Q, min(k, N)), best first.
+            With an ANN index a query can get fewer than min(k, N) candidates; its row is then
+            padded with index -1 and score -inf.
+        """
+        queries = np.asarray(query_matrix, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-10)
+        if self.ann is not None:
+            width = min(k, len(self))
+            indices = np.full((len(queries), width), -1, dtype=np.int64)
+            scores = np.full((len(queries), width), -np.inf, dtype=np.float32)
+            for i, query in enumerate(queries):
+                row_indices, row_scores = self.search_vector(query, k)
+                indices[i, :len(row_indices)] = row_indices
+                scores[i, :len(row_scores)] = row_scores
+            return indices, scores
+        n, n_queries = len(self), queries.shape[0]
+        k = min(k, n)
+        # Quantized scores only pick candidates; the final top-k comes from the exact re-rank
+        k_candidates = min(max(k, self.rerank), n) if self.quantized is not None else k
+        indices = np.empty((n_queries, k), dtype=np.int64)
+        scores = np.empty((n_queries, k), dtype=np.float32)
+        if k == 0 or n_queries == 0:
+            return indices, scores
+
+        cells = max(1, memory_budget // 4)
+        corpus_block = min(n, max(k_candidates, cells // min(n_queries, 256)))
+        query_block = max(1, min(n_queries, cells // corpus_block))
+
+        for q_start in range(0, n_queries, query_block):
+            block = queries[q_start:q_start + query_block]
+            best_idx = best_scores = None
+            for c_start in range(0, n, corpus_block):
+                block_scores = self._score_block(block, c_start, c_start + corpus_block)
+                block_idx, block_scores = top_k_rows(block_scores, min(k_candidates, block_scores.shape[1]))
+                block_idx = block_idx + c_start
+                if best_idx is None:
+                    best_idx, best_scores = block_idx, block_scores
+                else:
+                    # Merge the running top-k with this block's top-k
+                    merged_idx = np.concatenate([best_idx, block_idx], axis=1)
+                    merged_scores = np.concatenate([best_scores, block_scores], axis=1)
+                    columns, best_scores = top_k_rows(merged_scores, k_candidates)
+                    best_idx = np.take_along_axis(merged_idx, columns, axis=1)
+            if self.quantized is not None:
+                best_idx, best_scores = self._rerank(block, best_idx, k)
+            indices[q_start:q_start + len(block)] = best_idx
+            scores[q_start:q_start + len(block)] = best_scores
+        return indices, scores
+
+    def search_batch(self, queries: List[str], k: int = 1,
+                     memory_budget: int = DEFAULT_MEMORY_BUDGET) -> List[List[Tuple[str, str, float]]]:
+        """
+        Find the best matching QA pairs for many user queries at once.
+        Queries are preprocessed and embedded in batches and scored with blocked GEMMs.
+        Args:
+            queries: User input queries
+            k: Number of results per query
+            memory_budget: Maximum bytes for one block of float32 scores
+        Returns:
+            One list of (question, answer, similarity score) per query, best first
+        """
+        processed = list(preprocess_texts(queries))
+        query_matrix, _ = encode_stream(processed, len(processed))
+        indices, scores = self.search_vectors(query_matrix, k, memory_budget)
+        results = []
+        for row_indices, row_scores in zip(indices, scores):
+            matches = []
+            for idx, score in zip(row_indices, row_scores):
+                if idx < 0:
+                    # Padding of an ANN query with fewer than k candidates
+                    break
+                record = self.records[int(idx)]
+                matches.append((record["original_question"], record["original_answer"], float(score)))
+            results.append(matches)
+        return results
+
+    def search(self, query: str, k: int = 1) -> List[Tuple[str, str, float]]:
+        """
+        Find the best matching QA pairs for a user query.
+        Args:
+            query: User input query
+            k: Number of results
+        Returns:
+            List of (question, answer, similarity score), best first
+        """
+        query_embedding = get_embeddings([preprocess_text(query)])[0]
+        indices, scores = self.search_vector(query_embedding, k)
+        results = []
+        for idx, score in zip(indices, scores):
+            record = self.records[int(idx)]
+            results.append((record["original_question"], record["original_answer"], float(score)))
+        return results
+
 def find_best_match(query: str, qa_pairs: List[Dict]) -> Tuple[str, str, float]:
     """
     Find the best matching QA pair for a user query.
+    Builds a throwaway SimilarityIndex; keep a SimilarityIndex around when searching repeatedly.
     Args:
         query: User input query
         qa_pairs: List of QA pairs with embeddings
     Returns:
         Tuple of (best question, best answer, similarity score)
     """
-    processed_query = preprocess_text(query)
-    query_embedding = get_embeddings([processed_query])[0]
+    return SimilarityIndex.from_qa_pairs(qa_pairs).search(query, k=1)[0]
 
-    # Extract question embeddings into a matrix
-    embeddings_matrix = np.array([pair["question_embedding"] for pair in qa_pairs])
-    similarity_scores = cosine_similarity_matrix(query_embedding, embeddings_matrix)
-    
-    best_idx = int(np.argmax(similarity_scores))
-    best_pair = qa_pairs[best_idx]
-    best_score = float(similarity_scores[best_idx])
-    
-    return best_pair["original_question"], best_pair["original_answer"], best_score
+def find_best_matches(queries: List[str], qa_pairs: List[Dict], k: int = 1) -> List[List[Tuple[str, str, float]]]:
+    """
+    Find the top-k matching QA pairs for each of many queries in one batch.
+    Args:
+        queries: User input queries
+        qa_pairs: List of QA pairs with embeddings
+        k: Number of results per query
+    Returns:
+        One list of (question, answer, similarity score) per query, best first
+    """
+    return SimilarityIndex.from_qa_pairs(qa_pairs).search_batch(queries, k)
 
 # Example usage
 if __name__ == "__main__":
     from preprocess import preprocess_qa_pairs
+    from preprocess_cache import get_default_cache
     from embeddings import embed_qa_pairs
 
     with open("qa_pairs.json", "r", encoding="utf-8") as f:
@@ -50,12 +281,13 @@ if __name__ == "__main__":
 
     # Preprocess and embed dataset if embeddings are missing
     if "question_embedding" not in qa_pairs[0]:
-        preprocessed_data = preprocess_qa_pairs(qa_pairs)
+        preprocessed_data = preprocess_qa_pairs(qa_pairs, cache=get_default_cache())
         qa_pairs = embed_qa_pairs(preprocessed_data)
 
     # Test query
     query = "What does ARC-0 mean in Algorand?"
-    question, answer, score = find_best_match(query, qa_pairs)
+    index = SimilarityIndex.from_qa_pairs(qa_pairs)
+    question, answer, score = index.search(query)[0]
 
     print(f"\nQuery: {query}")
     print(f"Best Match Question: {question}")
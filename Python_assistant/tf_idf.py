@@ -1,11 +1,24 @@
 import json
+import os
 import re
-import spacy
-import unicodedata
-from typing import List, Dict
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+import scipy.sparse as sp
+from typing import List, Dict, Iterable, Optional, Tuple
 from preprocess import preprocess_text
+from preprocess_cache import cached_preprocess_texts, preprocess_fingerprint
+from embedding_store import _atomic_write, document_id
+from top_k import top_k_indices
+
+INDEX_DIR = "tfidf_index"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+MATRIX_FILE = "counts.npz"
+DF_FILE = "df.npy"
+VOCABULARY_FILE = "vocabulary.json"
+RECORDS_FILE = "records.jsonl"
+
+# Same tokens as TfidfVectorizer's default analyzer
+_TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
 
 
 def load_qa_pairs(file_path: str) -> List[Dict]:
@@ -13,46 +26,218 @@ def load_qa_pairs(file_path: str) -> List[Dict]:
     with open(file_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def setup_tfidf_search(qa_pairs: List[Dict]):
-    """Set up TF-IDF vectorizer and matrix for questions."""
-    questions = []
+class TfidfIndex:
+    """
+    Incremental TF-IDF index over preprocessed questions.
+    Raw term counts are kept in a CSR matrix together with per-term document frequencies,
+    so documents can be added or removed without refitting. IDF weights and the L2-normalized
+    TF-IDF rows are recomputed lazily, once per change, with TfidfVectorizer's defaults
+    (smooth idf, l2 norm), so scores match a fresh fit on the same documents.
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.df = np.zeros(0, dtype=np.int64)
+        self.counts = sp.csr_matrix((0, 0), dtype=np.float32)
+        # One record per row: id, original question and answer
+        self.records: List[Dict] = []
+        self._weighted: Optional[sp.csr_matrix] = None
+        self._idf: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def ids(self) -> List[str]:
+        return [record["id"] for record in self.records]
+
+    def _count_rows(self, texts: Iterable[str]) -> sp.csr_matrix:
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            row: Dict[int, int] = {}
+            for token in _TOKEN_PATTERN.findall(text.lower()):
+                column = self.vocabulary.setdefault(token, len(self.vocabulary))
+                row[column] = row.get(column, 0) + 1
+            indices.extend(row)
+            data.extend(row.values())
+            indptr.append(len(indices))
+        return sp.csr_matrix((np.array(data, dtype=np.float32), np.array(indices, dtype=np.int64), indptr),
+                             shape=(len(indptr) - 1, len(self.vocabulary)))
+
+    def add(self, qa_pairs: List[Dict]):
+        """
+        Preprocess and index new QA pairs.
+        Args:
+            qa_pairs: QA pairs with question and answer
+        """
+        if not qa_pairs:
+            return
+        rows = self._count_rows(cached_preprocess_texts(pair["question"] for pair in qa_pairs))
+        vocabulary_size = len(self.vocabulary)
+        self.counts.resize((self.counts.shape[0], vocabulary_size))
+        self.counts = sp.vstack([self.counts, rows], format="csr")
+        self.df = np.concatenate([self.df, np.zeros(vocabulary_size - len(self.df), dtype=np.int64)])
+        self.df += np.bincount(rows.indices, minlength=vocabulary_size)
+        self.records.extend({"id": document_id(pair), "question": pair["question"], "answer": pair["answer"]}
+                            for pair in qa_pairs)
+        self._weighted = None
+
+    def remove(self, ids: Iterable[str]):
+        """
+        Drop documents by id; their terms stay in the vocabulary with a lower document frequency.
+        Args:
+            ids: Document ids, see embedding_store.document_id
+        """
+        ids = set(ids)
+        keep = np.array([record["id"] not in ids for record in self.records], dtype=bool)
+        if keep.all():
+            return
+        removed = self.counts[~keep]
+        self.df -= np.bincount(removed.indices, minlength=len(self.df))
+        self.counts = self.counts[keep]
+        self.records = [record for record, kept in zip(self.records, keep) if kept]
+        self._weighted = None
+
+    def _ensure_weighted(self):
+        if self._weighted is None:
+            n = len(self.records)
+            self._idf = (np.log((1 + n) / (1 + self.df)) + 1).astype(np.float32)
+            weighted = self.counts.multiply(self._idf).tocsr()
+            norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+            self._weighted = sp.diags(1 / np.maximum(norms, 1e-10)).dot(weighted).tocsr()
+        return self._weighted
+
+    def search(self, query: str, k: int = 1) -> List[Tuple[str, str, float]]:
+        """
+        Top-k questions by cosine similarity of TF-IDF vectors.
+        Args:
+            query: User input query
+            k: Number of results
+        Returns:
+            List of (question, answer, score), best first
+        """
+        if not self.records:
+            return []
+        weighted = self._ensure_weighted()
+        columns, counts = self._query_counts(preprocess_text(query))
+        # Terms left only by removed documents are unknown to the index, like unseen terms
+        known = self.df[columns] > 0
+        columns, counts = columns[known], counts[known]
+        if len(columns) == 0:
+            return [(record["question"], record["answer"], 0.0) for record in self.records[:k]]
+        query_vec = counts * self._idf[columns]
+        query_vec /= np.linalg.norm(query_vec)
+        # Only the columns of the query terms contribute to the sparse dot product
+        scores = np.asarray(weighted[:, columns].dot(query_vec)).ravel()
+        return [(self.records[i]["question"], self.records[i]["answer"], float(scores[i]))
+                for i in top_k_indices(scores, k)]
+
+    def _query_counts(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        # Unknown terms are dropped, as TfidfVectorizer.transform does
+        row: Dict[int, int] = {}
+        for token in _TOKEN_PATTERN.findall(text.lower()):
+            column = self.vocabulary.get(token)
+            if column is not None:
+                row[column] = row.get(column, 0) + 1
+        return np.fromiter(row, dtype=np.int64, count=len(row)), np.fromiter(row.values(), dtype=np.float32, count=len(row))
+
+    def save(self, directory: str):
+        """
+        Write the counts (.npz), document frequencies, vocabulary, records and a manifest.
+        Each file is replaced atomically and the old manifest removed first, so a crash mid-save
+        leaves no manifest and load rebuilds instead of mixing old and new files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        _atomic_write(os.path.join(directory, MATRIX_FILE), lambda f: sp.save_npz(f, self.counts))
+        _atomic_write(os.path.join(directory, DF_FILE), lambda f: np.save(f, self.df))
+        _atomic_write(os.path.join(directory, VOCABULARY_FILE),
+                      lambda f: f.write(json.dumps(terms, ensure_ascii=False).encode("utf-8")))
+        _atomic_write(os.path.join(directory, RECORDS_FILE), lambda f: f.writelines(
+            json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n" for record in self.records))
+        manifest = {"format_version": FORMAT_VERSION, "preprocess": preprocess_fingerprint(),
+                    "count": len(self.records), "terms": len(terms)}
+        _atomic_write(manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+
+    @classmethod
+    def load(cls, directory: str) -> "TfidfIndex":
+        """
+        Open an index written by save.
+        Raises:
+            FileNotFoundError: If there is no index, or it was built with other preprocessing
+        """
+        path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No TF-IDF index in {directory}")
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION or manifest["preprocess"] != preprocess_fingerprint():
+            raise FileNotFoundError(f"TF-IDF index in {directory} is stale")
+        index = cls()
+        index.counts = sp.load_npz(os.path.join(directory, MATRIX_FILE)).tocsr()
+        index.df = np.load(os.path.join(directory, DF_FILE))
+        with open(os.path.join(directory, VOCABULARY_FILE), "r", encoding="utf-8") as f:
+            index.vocabulary = {term: i for i, term in enumerate(json.load(f))}
+        with open(os.path.join(directory, RECORDS_FILE), "r", encoding="utf-8") as f:
+            index.records = [json.loads(line) for line in f]
+        return index
+
+def setup_tfidf_search(qa_pairs: List[Dict], index_dir: Optional[str] = INDEX_DIR) -> TfidfIndex:
+    """
+    Load the saved TF-IDF index and bring it up to date with the QA pairs,
+    preprocessing only pairs that are new or edited.
+    Args:
+        qa_pairs: List of QA pairs
+        index_dir: Directory of the saved index; None keeps the index in memory only
+    Returns:
+        TfidfIndex
+    """
+    wanted = {}
     for pair in qa_pairs:
-        raw_question = pair["question"]
-        preprocessed_question = preprocess_text(raw_question)
-        questions.append(preprocessed_question)
-    vectorizer = TfidfVectorizer()
-    tfidf_matrix = vectorizer.fit_transform(questions)
-    return vectorizer, tfidf_matrix, questions, qa_pairs
-
-def tfidf_search(query: str, vectorizer, tfidf_matrix, questions, qa_pairs):
-    """Perform TF-IDF search with cosine similarity."""
-    query = preprocess_text(query)
-    query_vector = vectorizer.transform([query])
-    similarities = cosine_similarity(query_vector, tfidf_matrix)[0]
-    top_idx = similarities.argmax()
-    return qa_pairs[top_idx]["question"], qa_pairs[top_idx]["answer"], similarities[top_idx]
+        # Duplicate pairs share an id; keep the first
+        wanted.setdefault(document_id(pair), pair)
+    try:
+        index = TfidfIndex.load(index_dir) if index_dir else TfidfIndex()
+    except FileNotFoundError:
+        index = TfidfIndex()
+    indexed = set(index.ids)
+    removed = indexed - wanted.keys()
+    added = [pair for doc_id, pair in wanted.items() if doc_id not in indexed]
+    if removed or added:
+        index.remove(removed)
+        index.add(added)
+        if index_dir:
+            index.save(index_dir)
+    return index
+
+def tfidf_search(query: str, index: TfidfIndex) -> Tuple[str, str, float]:
+    """Best-matching QA pair by TF-IDF cosine similarity: (question, answer, score)."""
+    return index.search(query, k=1)[0]
 
 def main():
     qa_file = "qa_pairs.json"
     qa_pairs = load_qa_pairs(qa_file)
-    
+
     # Setup TF-IDF search
-    vectorizer, tfidf_matrix, questions, qa_pairs = setup_tfidf_search(qa_pairs)
-    
+    index = setup_tfidf_search(qa_pairs)
+
     # Print sample QA pair
     print("Sample QA Pair:", qa_pairs[0])
-    
+
     # Interactive loop
     print("Enter your query (or 'quit' to exit):")
     while True:
         query = input("> ")
         if query.lower() == 'quit':
             break
-        
-        question, answer, score = tfidf_search(query, vectorizer, tfidf_matrix, questions, qa_pairs)
+
+        question, answer, score = tfidf_search(query, index)
         print(f"\nMatched Question: {question}")
         print(f"Answer: {answer}")
         print(f"Score: {score:.4f}\n")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
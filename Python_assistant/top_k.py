@@ -0,0 +1,37 @@
+import numpy as np
+from typing import Tuple
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first, without sorting the whole array.
+    Args:
+        scores: Array of scores of shape (N,)
+        k: Number of results
+    Returns:
+        Array of at most k indices
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+def top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row-wise top-k of a 2-D score matrix, best first.
+    Args:
+        scores: Array of scores of shape (Q, N)
+        k: Number of results per row, at most N
+    Returns:
+        Tuple of (column indices, scores), both of shape (Q, k)
+    """
+    if k < scores.shape[1]:
+        columns = np.argpartition(scores, -k, axis=1)[:, -k:]
+    else:
+        columns = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    values = np.take_along_axis(scores, columns, axis=1)
+    order = np.argsort(-values, axis=1)
+    return np.take_along_axis(columns, order, axis=1), np.take_along_axis(values, order, axis=1)
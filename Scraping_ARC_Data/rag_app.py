@@ -1,16 +1,40 @@
-from sentence_transformers import SentenceTransformer, util
 import numpy as np
 import json
 import os
 import sys
 
+# Share the embedding backends of the Python assistant
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Python_assistant"))
+from embedders import get_embedder
+from ann_index import load_or_build_ann_index
+from quantization import QuantizedMatrix
+from similarity_search import SimilarityIndex, quantize_normalized
+
 VECTOR_DIR = "extension/data"
 TEXT_FILE = "arc_standards.txt"
+# Append-only page log written by scrape_data.py
+PAGES_FILE = "arc_standards.jsonl"
 EMBEDDING_FILE = os.path.join(VECTOR_DIR, "embeddings.npy")
 DOCUMENT_FILE = os.path.join(VECTOR_DIR, "documents.json")
+# URL, chunk number and content hash of each row of embeddings.npy, and how far the page log has been read
+PAGE_MANIFEST_FILE = os.path.join(VECTOR_DIR, "pages.json")
+# Pages are embedded as passages of this many words, overlapping by CHUNK_OVERLAP, so that with the
+# title each fits all-MiniLM-L6-v2's 256-token window instead of being truncated
+CHUNK_WORDS = 150
+CHUNK_OVERLAP = 30
+# "int8" or "float16" to score on a quantized copy and re-rank the best candidates in float32
+QUANTIZATION = os.environ.get("EMBEDDING_QUANTIZATION") or None
+# "ivf" (NumPy) or "hnsw" (faiss) to search an approximate index saved next to embeddings.npy
+ANN_INDEX = os.environ.get("ANN_INDEX") or None
+ANN_NPROBE = int(os.environ.get("ANN_NPROBE", "8"))
+ANN_EF_SEARCH = int(os.environ.get("ANN_EF_SEARCH", "64"))
+
+def quantized_file(kind):
+    return os.path.join(VECTOR_DIR, f"embeddings.{kind}.npy")
 
 def get_model():
-    return SentenceTransformer("all-MiniLM-L6-v2")
+    # all-MiniLM-L6-v2 unless $EMBEDDER picks another backend
+    return get_embedder(default="sentence-transformers")
 
 def text_to_vector(text_file=TEXT_FILE, model=None):
     os.makedirs(VECTOR_DIR, exist_ok=True)
@@ -18,38 +42,184 @@ def text_to_vector(text_file=TEXT_FILE, model=None):
     with open(text_file, "r", encoding="utf-8") as f:
         documents = [line.strip() for line in f if line.strip()]
 
-    embeddings = model.encode(documents, show_progress_bar=True, convert_to_numpy=True)
+    embeddings = model.embed(documents)
     
     np.save(EMBEDDING_FILE, embeddings)
     with open(DOCUMENT_FILE, "w", encoding="utf-8") as f:
         json.dump(documents, f, ensure_ascii=False)
 
+def page_chunks(page, words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Split a page into overlapping passages of at most `words` words, each prefixed with the title."""
+    tokens = page["content"].split()
+    step = words - overlap
+    starts = range(0, max(len(tokens) - overlap, 1), step)
+    return [f"{page['title']}: {' '.join(tokens[start:start + words])}" for start in starts]
+
+def read_page_log(pages_file=PAGES_FILE, offset=0):
+    """
+    Read the page log from a byte offset.
+    Returns:
+        ({url: latest page entry, or None if deleted}, offset after the last complete line)
+    """
+    updates = {}
+    with open(pages_file, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            # A line without its newline is still being written; pick it up next time
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            if line.strip():
+                entry = json.loads(line)
+                updates[entry["url"]] = None if entry.get("deleted") else entry
+    return updates, offset
+
+def _replace_file(path, write):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+def update_vectors(pages_file=PAGES_FILE, model=None):
+    """
+    Bring embeddings.npy and documents.json up to date with the page log, embedding only pages
+    whose content hash changed since the last run. Each page is one contiguous range of rows, one per
+    page_chunks passage, and a changed page replaces its whole range. Only the part of the log written
+    since the last run is read. When every changed page keeps its number of passages, its rows are
+    rewritten in place in the memory-mapped embeddings file; the file is only rewritten when rows are
+    added or removed. The manifest is written last, so an interrupted update is redone on the next run
+    (or, if it left the files out of step, everything is re-embedded).
+    Returns:
+        Dict with pages, rows, embedded and deleted counts
+    """
+    os.makedirs(VECTOR_DIR, exist_ok=True)
+    chunking = [CHUNK_WORDS, CHUNK_OVERLAP]
+    manifest = None
+    if os.path.exists(PAGE_MANIFEST_FILE) and os.path.exists(EMBEDDING_FILE) and os.path.exists(DOCUMENT_FILE):
+        with open(PAGE_MANIFEST_FILE, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        # Vectors from another model or of other passages cannot be mixed with new ones
+        rows = np.load(EMBEDDING_FILE, mmap_mode="r").shape[0]
+        if (manifest.get("model_id") != model.model_id or manifest.get("chunking") != chunking
+                or len(manifest["rows"]) != rows):
+            manifest = None
+    if manifest is None:
+        manifest = {"model_id": model.model_id, "chunking": chunking, "offset": 0, "rows": []}
+    if os.path.getsize(pages_file) < manifest["offset"]:
+        # The log was rewritten rather than appended to: read it all, hashes still skip unchanged pages
+        manifest["offset"] = 0
+
+    updates, offset = read_page_log(pages_file, manifest["offset"])
+    # url -> (first row, end row) of its passages, in row order
+    ranges = {}
+    for i, row in enumerate(manifest["rows"]):
+        ranges[row["url"]] = (ranges.get(row["url"], (i, i))[0], i + 1)
+    changed = [page for url, page in updates.items()
+               if page is not None and (url not in ranges or manifest["rows"][ranges[url][0]]["hash"] != page["hash"])]
+    deleted = {url for url, page in updates.items() if page is None and url in ranges}
+    manifest["offset"] = offset
+    if changed or deleted:
+        chunks = {page["url"]: page_chunks(page) for page in changed}
+        vectors = model.embed([text for page in changed for text in chunks[page["url"]]]) if changed else []
+        # url -> (passages, their vectors, page hash)
+        new = {}
+        position = 0
+        for page in changed:
+            count = len(chunks[page["url"]])
+            new[page["url"]] = (chunks[page["url"]], vectors[position:position + count], page["hash"])
+            position += count
+        documents = []
+        if ranges:
+            with open(DOCUMENT_FILE, "r", encoding="utf-8") as f:
+                documents = json.load(f)
+
+        if not deleted and all(url in ranges and len(texts) == ranges[url][1] - ranges[url][0]
+                               for url, (texts, _, _) in new.items()):
+            embeddings = np.load(EMBEDDING_FILE, mmap_mode="r+")
+            for url, (texts, page_vectors, page_hash) in new.items():
+                start, end = ranges[url]
+                embeddings[start:end] = page_vectors
+                documents[start:end] = texts
+                for row in manifest["rows"][start:end]:
+                    row["hash"] = page_hash
+            embeddings.flush()
+            del embeddings
+            # Derived files (quantized copy, ANN index) are rebuilt when older than embeddings.npy
+            os.utime(EMBEDDING_FILE)
+        else:
+            old = np.load(EMBEDDING_FILE, mmap_mode="r") if ranges else None
+            parts, new_documents, new_rows = [], [], []
+
+            def add(url, texts, page_vectors, page_hash):
+                parts.append(np.asarray(page_vectors, dtype=np.float32))
+                new_documents.extend(texts)
+                new_rows.extend({"url": url, "chunk": j, "hash": page_hash} for j in range(len(texts)))
+
+            for url, (start, end) in ranges.items():
+                if url in deleted:
+                    continue
+                if url in new:
+                    add(url, *new[url])
+                else:
+                    add(url, documents[start:end], old[start:end], manifest["rows"][start]["hash"])
+            for url, page in new.items():
+                if url not in ranges:
+                    add(url, *page)
+            dimension = vectors.shape[1] if len(vectors) else old.shape[1]
+            embeddings = np.vstack(parts) if parts else np.empty((0, dimension), dtype=np.float32)
+            del old
+            _replace_file(EMBEDDING_FILE, lambda f: np.save(f, embeddings))
+            documents, manifest["rows"] = new_documents, new_rows
+            ranges = {row["url"]: None for row in new_rows}
+        _replace_file(DOCUMENT_FILE, lambda f: f.write(json.dumps(documents, ensure_ascii=False).encode("utf-8")))
+    _replace_file(PAGE_MANIFEST_FILE, lambda f: f.write(json.dumps(manifest).encode("utf-8")))
+    return {"pages": len(ranges), "rows": len(manifest["rows"]), "embedded": len(changed), "deleted": len(deleted)}
+
 def load_knowledge_vector():
     if not os.path.exists(EMBEDDING_FILE) or not os.path.exists(DOCUMENT_FILE):
         raise FileNotFoundError("Embedding or document file not found. Run `text_to_vector()` first.")
     
-    embeddings = np.load(EMBEDDING_FILE)
+    # Memory-mapped, so a quantized index only pulls re-ranked rows into memory
+    embeddings = np.load(EMBEDDING_FILE, mmap_mode="r")
     with open(DOCUMENT_FILE, "r", encoding="utf-8") as f:
         documents = json.load(f)
 
     return embeddings, documents
 
-def query(text, model, embeddings, documents, top_k=1):
-    query_embedding = model.encode(text, convert_to_numpy=True)
-    scores = util.cos_sim(query_embedding, embeddings)[0]
-    top_k_indices = np.argsort(scores)[-top_k:][::-1]
-    
-    results = [(documents[idx], float(scores[idx])) for idx in top_k_indices]
+def build_index(embeddings, documents):
+    if ANN_INDEX:
+        params = {"nprobe": ANN_NPROBE} if ANN_INDEX == "ivf" else {"ef_search": ANN_EF_SEARCH}
+        ann = load_or_build_ann_index(EMBEDDING_FILE, ANN_INDEX, embeddings, **params)
+        return SimilarityIndex(embeddings, documents, ann=ann)
+    quantization = QUANTIZATION
+    if quantization:
+        path = quantized_file(quantization)
+        # Rebuild the quantized copy whenever embeddings.npy is newer
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(EMBEDDING_FILE):
+            quantize_normalized(embeddings, quantization).save(path)
+        quantization = QuantizedMatrix.load(path)
+    return SimilarityIndex(embeddings, documents, quantization=quantization)
+
+def query(text, model, index, documents, top_k=1):
+    query_embedding = model.embed([text])[0]
+    top_k_indices, scores = index.search_vector(query_embedding, top_k)
+
+    results = [(documents[idx], float(score)) for idx, score in zip(top_k_indices, scores)]
     return results
 
 def main():
     model = get_model()
 
-    if not os.path.exists(EMBEDDING_FILE) or not os.path.exists(DOCUMENT_FILE):
+    if os.path.exists(PAGES_FILE):
+        stats = update_vectors(PAGES_FILE, model)
+        print(f"{stats['pages']} pages in {stats['rows']} passages: "
+              f"{stats['embedded']} embedded, {stats['deleted']} deleted")
+    elif not os.path.exists(EMBEDDING_FILE) or not os.path.exists(DOCUMENT_FILE):
         print("Generating embeddings...")
         text_to_vector(TEXT_FILE, model)
 
     embeddings, documents = load_knowledge_vector()
+    index = build_index(embeddings, documents)
 
     print("RAG System Ready. Type 'quit' to exit.")
     while True:
@@ -58,7 +228,7 @@ def main():
             print("Exiting...")
             break
 
-        results = query(user_query, model, embeddings, documents)
+        results = query(user_query, model, index, documents)
         best_result, score = results[0]
         print(f"\nTop Match (Score: {score:.4f}):\n{best_result}")
 
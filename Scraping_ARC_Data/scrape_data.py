@@ -1,11 +1,24 @@
 import requests
 from bs4 import BeautifulSoup
+import argparse
+import hashlib
+import threading
 import time
 import os
 import json
-from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import formatdate
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin, urldefrag, urlparse
 import re
 
+START_URL = 'https://dev.algorand.co/arc-standards/arc-0000/'
+OUTPUT_FILE = 'arc_standards.jsonl'
+CHECKPOINT_FILE = 'crawl_checkpoint.json'
+# Most of the logged pages one crawl may delete; a larger drop is more likely a site or discovery problem
+MAX_DELETE_SHARE = 0.1
+
 # Headers to mimic a browser request
 headers = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -16,50 +29,60 @@ def clean_text(text):
     """Clean extracted text by removing excessive whitespace and newlines."""
     return re.sub(r'\s+', ' ', text.strip())
 
+def is_arc_page(url, start_url):
+    """True for pages of the ARC standards section on the same host as start_url."""
+    parsed = urlparse(url)
+    return parsed.netloc == urlparse(start_url).netloc and '/arc-standards/' in parsed.path
+
+def parse_page(html, url):
+    """Extract the page record and the rel=next URL; the record is None when the page has no content."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    next_url = None
+    next_link = soup.find('a', rel='next')
+    if next_link and 'href' in next_link.attrs:
+        candidate = urljoin(url, next_link['href'])
+        # Check if the next URL contains '/arc-standards/'
+        if '/arc-standards/' in candidate:
+            next_url = candidate
+
+    # Find the main content div
+    content_div = soup.find('div', class_='sl-markdown-content')
+    if not content_div:
+        return None, next_url
+
+    # Extract all text from the content div
+    content_text = clean_text(content_div.get_text(separator=' '))
+
+    # Get page title for reference
+    title = soup.find('h1').get_text(strip=True) if soup.find('h1') else 'Untitled'
+    try:
+        record = {"title": title, "content": content_text}
+        json.dumps(record, ensure_ascii=False).encode('utf-8')
+    except UnicodeEncodeError as e:
+        print(f"Encoding error at {url}: {e}")
+        # Fallback: Replace problematic characters
+        record = {
+            "title": title.encode('utf-8', errors='replace').decode('utf-8'),
+            "content": content_text.encode('utf-8', errors='replace').decode('utf-8')
+        }
+    return record, next_url
+
 def scrape_page(url, data_list):
     """Scrape content from a single page, append to data_list, and return the next URL."""
     try:
         # Send GET request
         response = requests.get(url, headers=headers, timeout=10)
         response.raise_for_status()  # Raise exception for bad status codes
-        
-        # Parse HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find the main content div
-        content_div = soup.find('div', class_='sl-markdown-content')
-        if not content_div:
+
+        record, next_url = parse_page(response.text, url)
+        if record is None:
             print(f"No content found at {url}")
             return None
-        
-        # Extract all text from the content div
-        content_text = clean_text(content_div.get_text(separator=' '))
-        
-        # Get page title for reference
-        title = soup.find('h1').get_text(strip=True) if soup.find('h1') else 'Untitled'
-        
-        # Append to data list
-        try:
-            data_list.append({"title": title, "content": content_text})
-        except UnicodeEncodeError as e:
-            print(f"Encoding error at {url}: {e}")
-            # Fallback: Replace problematic characters
-            data_list.append({
-                "title": title.encode('utf-8', errors='replace').decode('utf-8'),
-                "content": content_text.encode('utf-8', errors='replace').decode('utf-8')
-            })
-        
-        print(f"Scraped: {title} ({url})")
-        
-        # Find the next link
-        next_link = soup.find('a', rel='next')
-        if next_link and 'href' in next_link.attrs:
-            next_url = urljoin(url, next_link['href'])
-            # Check if the next URL contains '/arc-standards/'
-            if '/arc-standards/' in next_url:
-                return next_url
-        return None
-    
+        data_list.append(record)
+        print(f"Scraped: {record['title']} ({url})")
+        return next_url
+
     except requests.RequestException as e:
         print(f"Error fetching {url}: {e}")
         return None
@@ -67,33 +90,392 @@ def scrape_page(url, data_list):
         print(f"Error processing {url}: {e}")
         return None
 
-def main():
-    # Starting URL
-    start_url = 'https://dev.algorand.co/arc-standards/arc-0000/'
-    output_file = 'arc_standards.json'
-    
-    # Initialize data list
+def content_hash(record):
+    """SHA-256 of a page's title and content."""
+    return hashlib.sha256(json.dumps([record["title"], record["content"]], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class PageLog:
+    """
+    Append-only JSONL of scraped pages, one line per page version:
+    {"url", "title", "content", "hash", "scraped_at"}, or {"url", "deleted": true, "scraped_at"}
+    when a page is gone. A line is only written when a page is new or its content hash changed,
+    so the latest line of each URL is the current page and readers can skip what they have seen.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        # url -> hash of the latest version, None once deleted
+        self.hashes = {}
+        if os.path.exists(path):
+            with open(path, 'rb+') as f:
+                data = f.read()
+                # Drop a line left half-written by a crash, so new lines start clean
+                end = data.rfind(b'\n') + 1
+                if end < len(data):
+                    f.truncate(end)
+            for line in data[:end].decode('utf-8').splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    self.hashes[entry["url"]] = None if entry.get("deleted") else entry["hash"]
+
+    def current(self, url):
+        """Hash of the page's latest version, or None."""
+        return self.hashes.get(url)
+
+    def urls(self):
+        return [url for url, digest in self.hashes.items() if digest is not None]
+
+    def _write(self, entry):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def append(self, url, record):
+        """Write the page if it is new or changed; returns True if a line was written."""
+        digest = content_hash(record)
+        with self.lock:
+            if self.hashes.get(url) == digest:
+                return False
+            self._write({"url": url, "title": record["title"], "content": record["content"], "hash": digest,
+                         "scraped_at": time.time()})
+            self.hashes[url] = digest
+            return True
+
+    def delete(self, url):
+        """Write a tombstone for a page that no longer exists."""
+        with self.lock:
+            if self.hashes.get(url) is not None:
+                self._write({"url": url, "deleted": True, "scraped_at": time.time()})
+                self.hashes[url] = None
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: on average `rate` acquisitions per second, with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class Crawler:
+    """
+    Fetches the ARC pages in parallel, within a request rate limit.
+    The page list is discovered first (the sidebar of the start page, then the sitemap), then the
+    pages are fetched by a bounded thread pool, each thread reusing one keep-alive session.
+    Pages are revalidated with ETag / If-Modified-Since from the last crawl, so unchanged pages cost
+    a 304 and no parsing. New and changed pages are appended to the PageLog as they arrive.
+    Progress is saved to a checkpoint file after every page, and a crawl that was interrupted
+    resumes with the pages it had not finished.
+    Logged pages missing from the discovered list are deleted only after a crawl without errors,
+    discovery included, and never more than max_delete_share of them at once.
+    """
+
+    def __init__(self, log, start_url=START_URL, checkpoint_file=CHECKPOINT_FILE, workers=4, rate=2.0, burst=4,
+                 timeout=10, save_html=None, max_delete_share=MAX_DELETE_SHARE):
+        self.log = log
+        self.start_url = start_url
+        self.checkpoint_file = checkpoint_file
+        self.workers = workers
+        self.bucket = TokenBucket(rate, burst)
+        self.timeout = timeout
+        # Directory to mirror fetched HTML into, to serve later as fixtures
+        self.save_html = save_html
+        self.max_delete_share = max_delete_share
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stats = {"fetched": 0, "not_modified": 0, "changed": 0, "deleted": 0, "errors": 0}
+        self.checkpoint = self.load_checkpoint()
+
+    def load_checkpoint(self):
+        if os.path.exists(self.checkpoint_file):
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        # pages: url -> validators and content hash of the last fetch; run: the crawl in progress
+        return {"pages": {}, "run": None}
+
+    def save_checkpoint(self):
+        # Write a temporary file and rename it, so a crash never leaves a truncated checkpoint
+        tmp = f"{self.checkpoint_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.checkpoint, f, ensure_ascii=False)
+        os.replace(tmp, self.checkpoint_file)
+
+    def session(self):
+        """This thread's session, so connections are kept alive across its requests."""
+        if not hasattr(self.local, "session"):
+            session = requests.Session()
+            session.headers.update(headers)
+            self.local.session = session
+        return self.local.session
+
+    def get(self, url, **kwargs):
+        self.bucket.acquire()
+        return self.session().get(url, timeout=self.timeout, **kwargs)
+
+    def discover(self):
+        """
+        Ordered list of ARC page URLs: sidebar links of the start page, then any others in the sitemap.
+        Returns:
+            (pages, errors): errors counts the start page or sitemaps that could not be read, in which
+            case the list may be incomplete
+        """
+        pages = []
+        errors = 0
+
+        def add(url):
+            url = urldefrag(urljoin(self.start_url, url))[0]
+            if is_arc_page(url, self.start_url) and url not in pages:
+                pages.append(url)
+
+        add(self.start_url)
+        try:
+            response = self.get(self.start_url)
+            response.raise_for_status()
+            soup = BeautifulSoup(response.text, 'html.parser')
+            for link in soup.select('nav a[href]') or soup.find_all('a', href=True):
+                add(link['href'])
+        except requests.RequestException as e:
+            errors += 1
+            print(f"Error fetching {self.start_url}: {e}")
+
+        sitemaps = [urljoin(self.start_url, '/sitemap-index.xml'), urljoin(self.start_url, '/sitemap.xml')]
+        seen = set()
+        while sitemaps:
+            sitemap = sitemaps.pop(0)
+            if sitemap in seen:
+                continue
+            seen.add(sitemap)
+            try:
+                response = self.get(sitemap)
+            except requests.RequestException as e:
+                errors += 1
+                print(f"Error fetching {sitemap}: {e}")
+                continue
+            if response.status_code in (404, 410):
+                # The site has no sitemap at this address
+                continue
+            if response.status_code != 200:
+                errors += 1
+                print(f"Error fetching {sitemap}: HTTP {response.status_code}")
+                continue
+            for loc in re.findall(r'<loc>\s*([^<\s]+)\s*</loc>', response.text):
+                # A sitemap index lists further sitemaps
+                if loc.endswith('.xml'):
+                    sitemaps.append(loc)
+                else:
+                    add(loc)
+        return pages, errors
+
+    def fetch(self, url):
+        """Fetch one page, conditionally if it was fetched before; returns its record, None if it has no content."""
+        cached = self.checkpoint["pages"].get(url)
+        if cached and (cached.get("hash") is None or cached["hash"] != self.log.current(url)):
+            # The log does not hold this version (e.g. it was deleted): fetch the page in full
+            cached = None
+        conditional = {}
+        if cached and cached.get("etag"):
+            conditional['If-None-Match'] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            conditional['If-Modified-Since'] = cached["last_modified"]
+        response = self.get(url, headers=conditional)
+        if response.status_code == 304 and cached:
+            with self.lock:
+                self.stats["not_modified"] += 1
+            return {"title": cached["title"]}
+        response.raise_for_status()
+        if self.save_html:
+            path = os.path.join(self.save_html, urlparse(url).path.strip('/'), 'index.html')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(response.content)
+        record, _ = parse_page(response.text, url)
+        changed = record is not None and self.log.append(url, record)
+        with self.lock:
+            self.stats["fetched"] += 1
+            self.stats["changed"] += changed
+            if record is not None:
+                self.checkpoint["pages"][url] = {
+                    "etag": response.headers.get('ETag'),
+                    "last_modified": response.headers.get('Last-Modified'),
+                    "title": record["title"],
+                    "hash": self.log.current(url),
+                }
+        return record
+
+    def crawl(self):
+        """Crawl (or resume), appending new and changed pages to the log; returns the stats."""
+        run = self.checkpoint.get("run")
+        if run:
+            print(f"Resuming crawl: {len(run['done'])} of {len(run['pages'])} pages done")
+        else:
+            pages, discovery_errors = self.discover()
+            run = {"pages": pages, "done": [], "discovery_errors": discovery_errors}
+            self.checkpoint["run"] = run
+            self.save_checkpoint()
+            print(f"Discovered {len(run['pages'])} pages")
+        # Kept in the run, so a resumed crawl still knows its page list may be incomplete
+        discovery_errors = run.get("discovery_errors", 0)
+        self.stats["errors"] += discovery_errors
+        done = set(run["done"])
+        todo = [url for url in run["pages"] if url not in done]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.fetch, url): url for url in todo}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # Left out of "done", so the next run retries it
+                    with self.lock:
+                        self.stats["errors"] += 1
+                    print(f"Error fetching {url}: {e}")
+                    continue
+                if record is None:
+                    print(f"No content found at {url}")
+                else:
+                    print(f"Scraped: {record['title']} ({url})")
+                with self.lock:
+                    run["done"].append(url)
+                    self.save_checkpoint()
+        if self.stats["errors"] == discovery_errors:
+            # Finished: the next crawl discovers the list again
+            if discovery_errors:
+                print("Page discovery failed, so no pages are deleted in this crawl")
+            else:
+                self.delete_missing(run["pages"])
+            self.checkpoint["run"] = None
+            self.save_checkpoint()
+        seconds = time.perf_counter() - start
+        print(f"{self.stats['fetched']} fetched ({self.stats['changed']} new or changed), "
+              f"{self.stats['not_modified']} not modified, {self.stats['deleted']} deleted, "
+              f"{self.stats['errors']} errors in {seconds:.1f}s")
+        return self.stats
+
+    def delete_missing(self, listed):
+        """Delete logged pages that are no longer listed, unless that would be more than max_delete_share of them."""
+        logged = self.log.urls()
+        listed = set(listed)
+        missing = [url for url in logged if url not in listed]
+        if len(missing) > self.max_delete_share * len(logged):
+            print(f"Refusing to delete {len(missing)} of {len(logged)} logged pages "
+                  f"(more than {self.max_delete_share:.0%}); "
+                  f"rerun with a higher --max-delete-share if the pages are really gone")
+            return
+        for url in missing:
+            self.log.delete(url)
+            self.stats["deleted"] += 1
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """Static file handler that also sends an ETag and answers If-None-Match with 304."""
+    protocol_version = "HTTP/1.1"
+    # Saved pages are UTF-8; without a charset requests would decode them as ISO-8859-1
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, '.html': 'text/html; charset=utf-8'}
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            path = os.path.join(path, 'index.html')
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            etag = f'"{hashlib.md5(f"{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest()}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', formatdate(stat.st_mtime, usegmt=True))
+                self.end_headers()
+                return None
+            self._etag = etag
+        return super().send_head()
+
+    def end_headers(self):
+        etag = getattr(self, '_etag', None)
+        if etag:
+            self.send_header('ETag', etag)
+            self._etag = None
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fixture_server(directory, port=0):
+    """
+    Serve saved pages (see --save-html) from a local static HTTP server in a background thread.
+    Returns:
+        (server, base_url); call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), partial(FixtureHandler, directory=directory))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def scrape_sequential(start_url, log):
+    """Follow rel=next links one page at a time, as the scraper originally did, logging new and changed pages."""
     data_list = []
-    
     current_url = start_url
     while current_url:
         # Scrape current page and append to data_list
+        scraped = len(data_list)
         next_url = scrape_page(current_url, data_list)
-        
+        if len(data_list) > scraped:
+            log.append(current_url, data_list[-1])
+
         # Move to next URL if available
         current_url = next_url
-        
+
         # Add delay to avoid overwhelming the server
         if current_url:
             time.sleep(1)  # 1-second delay between requests
-    
-    # Save data to JSON file
-    try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data_list, f, ensure_ascii=False, indent=2)
-        print(f"Data saved to {output_file}")
-    except Exception as e:
-        print(f"Error saving JSON file: {e}")
+    return data_list
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape the ARC standards pages")
+    parser.add_argument("--start-url", default=START_URL)
+    parser.add_argument("--output", default=OUTPUT_FILE, help="Append-only JSONL of page versions")
+    parser.add_argument("--mode", choices=["crawl", "sequential"], default="crawl",
+                        help="crawl: discover pages, then fetch in parallel; sequential: follow rel=next links")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=2.0, help="Requests per second")
+    parser.add_argument("--burst", type=int, default=4, help="Requests allowed at once above the rate")
+    parser.add_argument("--save-html", default=None, help="Mirror fetched pages into this directory")
+    parser.add_argument("--fixtures", default=None, help="Crawl pages saved with --save-html from a local server")
+    parser.add_argument("--fixtures-port", type=int, default=8000,
+                        help="Port of the fixture server; keep it fixed so the checkpoint's URLs match across runs")
+    parser.add_argument("--max-delete-share", type=float, default=MAX_DELETE_SHARE,
+                        help="Most of the logged pages one crawl may delete, as a fraction")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        server, base_url = start_fixture_server(args.fixtures, args.fixtures_port)
+        args.start_url = urljoin(base_url, urlparse(args.start_url).path)
+        print(f"Serving {args.fixtures} at {base_url}")
+
+    log = PageLog(args.output)
+    if args.mode == "crawl":
+        crawler = Crawler(log, args.start_url, args.checkpoint, workers=args.workers, rate=args.rate,
+                          burst=args.burst, save_html=args.save_html, max_delete_share=args.max_delete_share)
+        crawler.crawl()
+    else:
+        scrape_sequential(args.start_url, log)
+    print(f"{len(log.urls())} pages in {args.output}")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()